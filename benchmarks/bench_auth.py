@@ -0,0 +1,63 @@
+"""
+PIN hashing benchmarks, run from the repo root:
+
+    python -m benchmarks.bench_auth
+
+Calibrates the KDF like the app does at startup, then measures login throughput and latency
+with many concurrent logins for several hashing pool sizes.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import statistics
+import time
+
+from streamlit_app.utils.pin_hashing import TARGET_MS, PinHasher, calibrate
+
+
+def bench_logins(hasher: PinHasher, pin_hash: str, n_logins: int, n_clients: int) -> dict:
+    """n_clients threads (the sessions' script threads) verifying n_logins PINs in total."""
+    def login(_) -> float:
+        start = time.perf_counter()
+        ok, _ = hasher.verify("1234", pin_hash)
+        assert ok
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_clients) as clients:
+        latencies = sorted(clients.map(login, range(n_logins)))
+    seconds = time.perf_counter() - start
+    return {
+        "logins_per_s": n_logins / seconds,
+        "p50_ms": statistics.median(latencies) * 1e3,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1e3,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-ms", type=float, default=TARGET_MS)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=32, help="concurrent logins")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    params = calibrate(args.target_ms)
+    print(f"Calibrated {params.scheme} {params.encode()} in {(time.perf_counter() - start) * 1e3:.0f} ms")
+
+    legacy_hash = hashlib.sha256(b"1234").hexdigest()
+    print(f"\n{args.logins} logins from {args.clients} concurrent sessions")
+    print(f"{'hash':<10} {'workers':>8} {'logins/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for workers in args.workers:
+        hasher = PinHasher(params, workers=workers)
+        for label, pin_hash in (("kdf", hasher.hash("1234")), ("legacy", legacy_hash)):
+            result = bench_logins(hasher, pin_hash, args.logins, args.clients)
+            print(
+                f"{label:<10} {workers:>8} {result['logins_per_s']:>10.1f} "
+                f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
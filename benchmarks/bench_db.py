@@ -0,0 +1,232 @@
+"""
+Database benchmarks, run from the repo root:
+
+    python -m benchmarks.bench_db
+"""
+import argparse
+from pathlib import Path
+import random
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from streamlit_app.db import PROFILES, connect
+from streamlit_app.db.availability import ALL_SLOTS
+from streamlit_app.db.overlap import AvailabilityIndex
+from streamlit_app.db.player import SELECT_PLAYER_BY
+from streamlit_app.db.records import PlayerRecord
+
+SCHEMA_PATH = Path(__file__).resolve().parents[1] / "streamlit_app" / "db" / "schema.sql"
+SLOTS = ALL_SLOTS
+NOW = "2025-01-01T00:00:00+00:00"
+
+
+def _setup(path: Path, profile: str, n_players: int, n_activities: int):
+    conn = connect(path, profile=profile)
+    conn.executescript(SCHEMA_PATH.read_text(encoding="utf-8"))
+    conn.executemany(
+        "INSERT INTO player (user_game_id, game_username, created_at) VALUES (?, ?, ?)",
+        [(i, f"player{i}", NOW) for i in range(1, n_players + 1)],
+    )
+    conn.executemany(
+        "INSERT INTO activity (name, event_date, created_at) VALUES (?, ?, ?)",
+        [(f"activity{i}", "2025-01-01", NOW) for i in range(1, n_activities + 1)],
+    )
+    conn.commit()
+    return conn
+
+
+def _save(conn, player_id: int, activity_id: int, slots: list[str]) -> None:
+    """
+    Rewrite every slot of a (player, activity) pair. This is the full delete-and-insert
+    save the app used before save_availability wrote only the diff: a heavier write, which
+    keeps the comparison between storage profiles on the pessimistic side.
+    """
+    conn.execute("DELETE FROM availability WHERE player_id = ? AND activity_id = ?", (player_id, activity_id))
+    conn.executemany(
+        "INSERT INTO availability (player_id, activity_id, slot, created_at) VALUES (?, ?, ?, ?)",
+        [(player_id, activity_id, slot, NOW) for slot in slots],
+    )
+    conn.commit()
+
+
+def bench_profile(profile: str, n_writes: int, n_reads: int, n_players: int, n_activities: int) -> dict:
+    rng = random.Random(398)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = _setup(Path(tmp) / "bench.db", profile, n_players, n_activities)
+
+        start = time.perf_counter()
+        for _ in range(n_writes):
+            _save(conn, rng.randint(1, n_players), rng.randint(1, n_activities), rng.sample(SLOTS, 12))
+        write_seconds = time.perf_counter() - start
+
+        latencies = []
+        for _ in range(n_reads):
+            t0 = time.perf_counter()
+            conn.execute(
+                "SELECT slot FROM availability WHERE player_id = ? AND activity_id = ? ORDER BY slot",
+                (rng.randint(1, n_players), rng.randint(1, n_activities)),
+            ).fetchall()
+            latencies.append(time.perf_counter() - t0)
+        conn.close()
+
+    latencies.sort()
+    return {
+        "profile": profile,
+        "writes_per_s": n_writes / write_seconds,
+        "read_p50_us": statistics.median(latencies) * 1e6,
+        "read_p95_us": latencies[int(len(latencies) * 0.95)] * 1e6,
+    }
+
+
+def bench_shards(n_shards: int, n_writers: int, n_writes: int, n_players: int, n_activities: int) -> float:
+    """Aggregate writes/s of n_writers threads spread over n_shards database files."""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [Path(tmp) / f"kingdom-{i}.db" for i in range(n_shards)]
+        for path in paths:
+            _setup(path, "durable", n_players, n_activities).close()
+
+        def writer(i: int) -> None:
+            rng = random.Random(i)
+            conn = connect(paths[i % n_shards], profile="durable")
+            for _ in range(n_writes):
+                _save(conn, rng.randint(1, n_players), rng.randint(1, n_activities), rng.sample(SLOTS, 12))
+            conn.close()
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(n_writers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return n_writers * n_writes / (time.perf_counter() - start)
+
+
+def _player_as_dict(conn, column: str, value):
+    """get_player_by as it was: f-string query and a fresh dict per lookup."""
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT player_id, user_game_id, game_username, app_username, pin_hash, alliance, is_admin, is_super_admin, created_at
+        FROM player
+        WHERE {column} = ?
+        """,
+        (value,),
+    )
+    row = cur.fetchone()
+    keys = ("player_id", "user_game_id", "game_username", "app_username", "pin_hash", "alliance",
+            "is_admin", "is_super_admin", "created_at")
+    return dict(zip(keys, row))
+
+
+def _player_as_record(conn, column: str, value):
+    """get_player_by as it is now: constant query and a __slots__ record from the row factory."""
+    cur = conn.cursor()
+    cur.row_factory = PlayerRecord.from_row
+    cur.execute(SELECT_PLAYER_BY[column], (value,))
+    return cur.fetchone()
+
+
+def bench_rows(lookup, n_lookups: int, n_players: int) -> dict:
+    """Lookup latency, and memory held by n_players looked-up rows."""
+    rng = random.Random(398)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = _setup(Path(tmp) / "bench.db", "durable", n_players, 1)
+
+        start = time.perf_counter()
+        for _ in range(n_lookups):
+            lookup(conn, "game_username", f"player{rng.randint(1, n_players)}")
+        seconds = time.perf_counter() - start
+
+        tracemalloc.start()
+        kept = [lookup(conn, "player_id", player_id) for player_id in range(1, n_players + 1)]
+        held_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del kept
+        conn.close()
+
+    return {"lookup_us": seconds / n_lookups * 1e6, "bytes_per_row": held_bytes / n_players}
+
+
+def bench_overlap(n_players: int, n_activities: int) -> dict:
+    """Index build time, and free-for-both latency of the index vs. a self-join per activity pair."""
+    rng = random.Random(398)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = _setup(Path(tmp) / "bench.db", "throughput", n_players, n_activities)
+        conn.executemany(
+            "INSERT INTO availability (player_id, activity_id, slot, created_at) VALUES (?, ?, ?, ?)",
+            [
+                (player_id, activity_id, slot, NOW)
+                for player_id in range(1, n_players + 1)
+                for activity_id in rng.sample(range(1, n_activities + 1), min(5, n_activities))
+                for slot in rng.sample(SLOTS, 12)
+            ],
+        )
+        conn.commit()
+
+        start = time.perf_counter()
+        index = AvailabilityIndex.from_connection(conn)
+        build_seconds = time.perf_counter() - start
+
+        pairs = [tuple(rng.sample(range(1, n_activities + 1), 2)) for _ in range(50)]
+        start = time.perf_counter()
+        for a, b in pairs:
+            index.free_for_both(a, b)
+        index_seconds = (time.perf_counter() - start) / len(pairs)
+
+        start = time.perf_counter()
+        for a, b in pairs:
+            conn.execute(
+                """
+                SELECT a.player_id, a.slot FROM availability a
+                JOIN availability b ON b.player_id = a.player_id AND b.slot = a.slot
+                WHERE a.activity_id = ? AND b.activity_id = ?
+                """,
+                (a, b),
+            ).fetchall()
+        sql_seconds = (time.perf_counter() - start) / len(pairs)
+        conn.close()
+
+    return {"build_ms": build_seconds * 1e3, "index_us": index_seconds * 1e6, "sql_us": sql_seconds * 1e6}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writes", type=int, default=2_000)
+    parser.add_argument("--reads", type=int, default=20_000)
+    parser.add_argument("--players", type=int, default=2_000)
+    parser.add_argument("--activities", type=int, default=20)
+    parser.add_argument("--shards", type=int, default=4, help="writer threads (and max shards) for the sharding benchmark")
+    args = parser.parse_args()
+
+    print("Tuning profiles: save_availability-style writes and slot lookups")
+    print(f"{'profile':<12} {'writes/s':>10} {'read p50 us':>12} {'read p95 us':>12}")
+    for profile in PROFILES:
+        result = bench_profile(profile, args.writes, args.reads, args.players, args.activities)
+        print(
+            f"{result['profile']:<12} {result['writes_per_s']:>10.0f} "
+            f"{result['read_p50_us']:>12.1f} {result['read_p95_us']:>12.1f}"
+        )
+
+    print("\nPlayer lookups: dict rows vs __slots__ records with a constant query")
+    print(f"{'rows':<12} {'lookup us':>10} {'bytes/row':>10}")
+    for label, lookup in (("dict", _player_as_dict), ("record", _player_as_record)):
+        result = bench_rows(lookup, args.reads, args.players)
+        print(f"{label:<12} {result['lookup_us']:>10.1f} {result['bytes_per_row']:>10.0f}")
+
+    print(f"\nKingdom shards: {args.shards} concurrent writers, durable profile")
+    print(f"{'shards':<12} {'writes/s':>10}")
+    n_writes = max(args.writes // args.shards, 1)
+    for n_shards in sorted({1, *range(2, args.shards + 1, 2), args.shards}):
+        writes_per_s = bench_shards(n_shards, args.shards, n_writes, args.players, args.activities)
+        print(f"{n_shards:<12} {writes_per_s:>10.0f}")
+
+    print("\nAvailability overlap: bitset index vs. SQL self-join, free for both activities")
+    result = bench_overlap(args.players, args.activities)
+    print(f"index build {result['build_ms']:.0f} ms, query {result['index_us']:.0f} us (index) vs {result['sql_us']:.0f} us (SQL)")
+
+
+if __name__ == "__main__":
+    main()
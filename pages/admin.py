@@ -1,15 +1,34 @@
+import csv
+import io
+import json
+from pathlib import Path
+
 import streamlit as st
 
-from streamlit_app.db import init_db
-from streamlit_app.db import player as player_db
-from streamlit_app.db.activity import create_activity, get_all_activities
-from streamlit_app.db.export import get_table_df
+from streamlit_app.db import current_kingdom
+from streamlit_app.db.archive import get_archived_activities, restore_activity
+from streamlit_app.db.backup import list_backups, start_backup_service
+from streamlit_app.db.export import EXPORT_TABLES
+from streamlit_app.db.maintenance import TASKS, start_maintenance_scheduler
+from streamlit_app.db.memory import resource_memory
+from streamlit_app.db.overlap import get_availability_index
+from streamlit_app.db.repository import SqliteRepository, get_repository
+from streamlit_app.db.roster_import import import_roster
+from streamlit_app.db.shards import get_kingdom_stats
+from streamlit_app.db.snapshot import get_snapshot, get_snapshot_manager
 from streamlit_app.utils.authentication import authenticate_admin, hash_pin
+from streamlit_app.utils.job_runner import JOBS, cancel_job, list_jobs, submit_job
+from streamlit_app.utils.kingdom import render_kingdom_selector
+from streamlit_app.utils.session_memory import get_session_registry, session_state_sizes, track_session
 
 
 def main():
     st.set_page_config(page_title="Kingshot 398 admin", page_icon="🔒")
-    init_db()
+    render_kingdom_selector()
+    repo = get_repository()
+    repo.init()
+    track_session("admin")
+    sqlite_storage = isinstance(repo, SqliteRepository)
 
     if "admin_id" not in st.session_state:
         st.session_state["admin_id"] = None
@@ -19,9 +38,9 @@ def main():
     st.title("Admin - Manage activities")
 
     ### First time admin setup (ugh streamlit cloud)
-    # Todo persistent database
+    # On a fresh instance init_db() restores the latest backup first, see streamlit_app/db/backup.py
 
-    if not player_db.any_admin_exists():
+    if not repo.any_admin_exists():
         st.warning("No admin account exists yet. Setup the super admin.")
 
         with st.form("create_admin_form"):
@@ -61,7 +80,7 @@ def main():
             pin_hash = hash_pin(pin)
 
             try:
-                player_db.create_player(
+                repo.create_player(
                     user_game_id=user_game_id,
                     game_username=game_username,
                     app_username=app_username,
@@ -89,7 +108,7 @@ def main():
         if submitted:
             ok, msg = authenticate_admin(app_username, pin)
             if ok:
-                admin = player_db.get_player_by("app_username", app_username)
+                admin = repo.get_player_by("app_username", app_username)
                 st.session_state["admin_id"] = admin["user_game_id"]
                 st.session_state["admin_name"] = admin["app_username"]
                 st.session_state["is_super_admin"] = bool(admin["is_super_admin"])
@@ -122,7 +141,7 @@ def main():
             st.error("A name for the activity must be provided.")
         else:
             event_date_str = event_date.isoformat() if event_date else None
-            create_activity(
+            repo.create_activity(
                 name=name,
                 description=description,
                 event_date=event_date_str,
@@ -132,7 +151,7 @@ def main():
 
     st.subheader("Existing activities")
 
-    activities = get_all_activities()
+    activities = repo.get_all_activities()
     if not activities:
         st.info("No activities found.")
     else:
@@ -149,14 +168,93 @@ def main():
             ]
         )
 
+    if sqlite_storage:    # roster import, archive, snapshots, backups and maintenance only exist for SQLite
+        st.subheader("Import players")
+        st.caption(
+            "Upload a roster CSV with columns **user_game_id**, **game_username** and optionally **alliance**. "
+            "Existing players are matched on in-game ID and updated."
+        )
+        with st.form("roster_import_form"):
+            roster_file = st.file_uploader("Roster CSV", type="csv")
+            dry_run = st.checkbox("Dry run", value=True, help="Check the file without saving anything")
+            submitted_import = st.form_submit_button("Import players")
+
+        if submitted_import:
+            if roster_file is None:
+                st.error("Choose a CSV file first.")
+            else:
+                try:
+                    result = import_roster(
+                        io.TextIOWrapper(roster_file, encoding="utf-8-sig", newline=""), dry_run=dry_run
+                    )
+                except UnicodeDecodeError:
+                    st.error("The file is not UTF-8 text. Export the roster again as CSV (UTF-8).")
+                except (ValueError, csv.Error) as e:
+                    st.error(f"Could not read the roster: {e}")
+                else:
+                    prefix = "Dry run: would have" if result.dry_run else "Done:"
+                    st.success(
+                        f"{prefix} inserted {result.inserted}, updated {result.updated} "
+                        f"({result.unchanged} unchanged, {len(result.conflicts)} conflicts)."
+                    )
+                    if result.conflicts:
+                        st.table([{"Line": line, "Problem": reason} for line, reason in result.conflicts])
+
+        st.subheader("Archive")
+        st.caption(
+            "Move availability of inactive and past activities to the archive database. "
+            "Archived data stays readable and can be restored."
+        )
+
+        if st.button("Archive past activities"):
+            _, created = submit_job("archive_past_activities", created_by=st.session_state["admin_name"])
+            if created:
+                st.success("Archiving started, follow it under **Background jobs**.")
+            else:
+                st.info("Archiving is already running.")
+
+        archived = get_archived_activities()
+        if archived:
+            st.table(
+                [
+                    {
+                        "ID": activity["id"],
+                        "Name": activity["name"],
+                        "Date": activity["event_date"],
+                        "Rows": activity["n_rows"],
+                        "Archived at": activity["archived_at"],
+                    }
+                    for activity in archived
+                ]
+            )
+
+            restore_id = st.selectbox(
+                "Restore activity",
+                options=[activity["id"] for activity in archived],
+                format_func=lambda activity_id: next(a["name"] for a in archived if a["id"] == activity_id),
+            )
+            if st.button("Restore from archive"):
+                n_rows = restore_activity(restore_id)
+                st.success(f"Restored {n_rows} availability slots.")
+                st.rerun()
+
+    if sqlite_storage:
+        render_availability_analysis()
+
     st.subheader("Export data")
 
     st.caption("Download CSV snapshots of the current database tables.")
 
+    if sqlite_storage:
+        snapshot = get_snapshot()
+        st.caption(f"Snapshot taken {int(snapshot.age_seconds)} seconds ago, it refreshes automatically after changes.")
+        if st.button("Refresh snapshot"):
+            get_snapshot_manager().refresh()
+
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        df_players = get_table_df("player")
+        df_players = repo.get_table_df("player", snapshot=True)
         st.download_button(
             label="Download players.csv",
             data=df_players.to_csv(index=False).encode("utf-8"),
@@ -165,7 +263,7 @@ def main():
         )
 
     with col2:
-        df_activities = get_table_df("activity")
+        df_activities = repo.get_table_df("activity", snapshot=True)
         st.download_button(
             label="Download activities.csv",
             data=df_activities.to_csv(index=False).encode("utf-8"),
@@ -174,7 +272,7 @@ def main():
         )
 
     with col3:
-        df_availability = get_table_df("availability")
+        df_availability = repo.get_table_df("availability", snapshot=True)
         st.download_button(
             label="Download availability.csv",
             data=df_availability.to_csv(index=False).encode("utf-8"),
@@ -182,13 +280,16 @@ def main():
             mime="text/csv",
         )
 
+    if sqlite_storage:
+        render_background_jobs()
+
     # Super admin area
     if st.session_state.get("is_super_admin"):
         st.markdown("---")
         st.subheader("Super admin - player management")
         st.success(f"Hi {st.session_state.get("admin_name")} :)")
 
-        df_players = get_table_df("player")
+        df_players = repo.get_table_df("player")
 
         if df_players.empty:
             st.info("No players found.")
@@ -221,9 +322,227 @@ def main():
                 if changed_rows.empty:
                     st.info("No changes made.")
                 else:
-                    n_updated = player_db.update_players_from_df(changed_rows)
+                    n_updated = repo.update_players_from_df(changed_rows)
                     st.success(f"Saved changes for {n_updated} player{'s' if n_updated != 1 else ''}.")
                     st.rerun()
 
+        if sqlite_storage:
+            st.subheader("Super admin - kingdoms")
+            st.table(get_kingdom_stats())
+
+            st.subheader("Super admin - backups")
+            backups = start_backup_service()
+
+            for db_name, metrics in backups.restore_metrics.items():
+                st.info(
+                    f"**{db_name}** restored at startup from **{metrics['backup']}** "
+                    f"({metrics['size_bytes'] / 1e6:.1f} MB) in {metrics['total_seconds']} s."
+                )
+            n_backups = len(list_backups())
+            st.caption(
+                f"Last backup: {backups.last_backup_at or 'none since startup'}. "
+                f"{n_backups} backup{'s' if n_backups != 1 else ''} on disk."
+            )
+            if backups.last_error:
+                st.error(f"Last backup failed: {backups.last_error}")
+
+            if st.button("Back up now"):
+                paths = backups.backup_now()
+                if paths:
+                    st.success(f"Backup written to {', '.join(path.name for path in paths)}.")
+                if backups.last_error:
+                    st.error(f"Backup failed: {backups.last_error}")
+
+            st.subheader("Super admin - database maintenance")
+            scheduler = start_maintenance_scheduler()
+            status = scheduler.status(current_kingdom())
+
+            st.caption(f"Kingdom **{current_kingdom()}**, tuning profile **{status['profile']}**")
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Database size", f"{status['db_size_bytes'] / 1e6:.1f} MB")
+            c2.metric("WAL size", f"{status['wal_size_bytes'] / 1e6:.1f} MB")
+            c3.metric("Pages", status["page_count"])
+            c4.metric("Free pages", status["freelist_count"])
+
+            st.table(
+                [
+                    {"Task": name, "Last run": last_run or "not yet"}
+                    for name, last_run in status["last_run"].items()
+                ]
+            )
+            if status["last_error"]:
+                st.error(f"Last maintenance error: {status['last_error']}")
+
+            task = st.selectbox("Maintenance task", options=list(TASKS))
+            if st.button("Run task now"):
+                scheduler.run_task(task)
+                st.rerun()
+
+        render_memory_report()
+
+
+def render_memory_report():
+    """Memory held by open sessions and by the process-wide caches."""
+    st.subheader("Super admin - memory")
+    registry = get_session_registry()
+    sessions = registry.largest(10)
+    resources = resource_memory()
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Sessions (last hour)", len(registry))
+    c2.metric("Session state", f"{registry.total_bytes() / 1e6:.1f} MB")
+    c3.metric("Caches", f"{sum(r.bytes for r in resources) / 1e6:.1f} MB")
+
+    st.markdown("**Largest sessions**")
+    st.table(
+        [
+            {
+                "Session": session.session_id[:8],
+                "Page": session.page,
+                "User": session.user or "-",
+                "Keys": session.n_keys,
+                "Size (kB)": round(session.total_bytes / 1e3, 1),
+                "Largest key": session.largest_keys[0][0] if session.largest_keys else "-",
+            }
+            for session in sessions
+        ]
+    )
+
+    if resources:
+        st.markdown("**Caches**")
+        st.table(
+            [
+                {
+                    "Cache": resource.resource.rsplit(".", 1)[-1].lstrip("_"),
+                    "For": ", ".join(map(str, resource.args)) or "-",
+                    "Size (kB)": round(resource.bytes / 1e3, 1),
+                }
+                for resource in resources
+            ]
+        )
+
+    with st.expander("This session's state"):
+        st.table([{"Key": key, "Size (bytes)": size} for key, size in session_state_sizes().items()])
+
+
+def render_availability_analysis():
+    """Overlaps between active activities and alliance coverage per slot."""
+    st.subheader("Availability analysis")
+    index = get_availability_index()
+    if not index.activities:
+        st.info("No active activities.")
+        return
+
+    def activity_label(activity_id: int) -> str:
+        name, event_date = index.activities[activity_id]
+        return f"{name} ({event_date})" if event_date else name
+
+    activity_ids = list(index.activities)
+
+    st.markdown("**Free for both**")
+    c1, c2 = st.columns(2)
+    activity_a = c1.selectbox("Activity", activity_ids, format_func=activity_label, key="overlap_a")
+    activity_b = c2.selectbox("Other activity", activity_ids, format_func=activity_label, key="overlap_b",
+                              index=min(1, len(activity_ids) - 1))
+    shared = index.free_for_both(activity_a, activity_b)
+    if shared:
+        st.table(
+            [
+                {"Player": index.player_names.get(player_id, player_id), "Shared slots": ", ".join(slots)}
+                for player_id, slots in shared.items()
+            ]
+        )
+    else:
+        st.caption("Nobody is available for both at the same time.")
+
+    st.markdown("**Double bookings**")
+    st.caption("Players available at the same time for two activities on the same date.")
+    bookings = index.double_bookings()
+    if bookings:
+        st.table(
+            [
+                {
+                    "Player": index.player_names.get(booking.player_id, booking.player_id),
+                    "Date": booking.event_date,
+                    "Activities": " / ".join(index.activities[a][0] for a in booking.activity_ids),
+                    "Slots": ", ".join(booking.slots),
+                }
+                for booking in bookings
+            ]
+        )
+    else:
+        st.caption("No double bookings.")
+
+    st.markdown("**Alliance coverage**")
+    if not index.alliances:
+        st.caption("No players have an alliance set.")
+        return
+    c1, c2, c3 = st.columns(3)
+    activity_id = c1.selectbox("Activity", activity_ids, format_func=activity_label, key="coverage_activity")
+    alliance = c2.selectbox("Alliance", index.alliances, key="coverage_alliance")
+    min_members = c3.number_input("At least members", min_value=1, value=5, step=1, key="coverage_min")
+    covered = index.alliance_slots(activity_id, alliance, int(min_members))
+    if covered:
+        st.table([{"Slot": slot, "Members available": count} for slot, count in covered])
+    else:
+        st.caption(f"No slot has {min_members} or more members of {alliance} available.")
+
+
+def render_background_jobs():
+    """Start exports in the background, follow running jobs and download their results."""
+    st.subheader("Background jobs")
+    st.caption("Large exports run in the background so the app stays responsive. Reload the page to update progress.")
+
+    columns = st.columns(len(EXPORT_TABLES))
+    for column, table in zip(columns, EXPORT_TABLES):
+        if column.button(f"Export {table}", key=f"export_job_{table}"):
+            _, created = submit_job("export_table", {"table": table}, created_by=st.session_state["admin_name"])
+            if not created:
+                st.info(f"An export of **{table}** is already running.")
+
+    jobs = list_jobs()
+    if not jobs:
+        st.info("No background jobs yet.")
+        return
+
+    for job in jobs:
+        spec = JOBS.get(job.name)
+        label = spec.label if spec else job.name
+        params = json.loads(job.params)
+        if params:
+            label += f" ({', '.join(str(value) for value in params.values())})"
+
+        with st.container(border=True):
+            st.markdown(f"**{label}** - {job.status}, started by {job.created_by or 'unknown'} at {job.created_at}")
+            if job.status in ("queued", "running"):
+                st.progress(job.progress, text=job.message)
+                if st.button("Cancel", key=f"cancel_job_{job.id}", disabled=bool(job.cancel_requested)):
+                    cancel_job(job.id)
+                    st.rerun()
+            elif job.status == "failed":
+                st.error(job.error)
+            elif job.status == "done" and job.result:
+                result = json.loads(job.result)
+                path = Path(result["path"]) if "path" in result else None
+                if path is not None and not path.exists():
+                    st.caption(f"{path.name} has been cleaned up, export again to download it.")
+                elif path is not None and st.session_state.get("download_job_id") != job.id:
+                    # Files are only read for the export being downloaded, not for every export on every rerun
+                    if st.button(f"Prepare {path.name} ({result['rows']} rows)", key=f"prepare_job_{job.id}"):
+                        st.session_state["download_job_id"] = job.id
+                        st.rerun()
+                elif path is not None:
+                    st.download_button(
+                        label=f"Download {path.name} ({result['rows']} rows)",
+                        data=path.read_bytes(),
+                        file_name=path.name,
+                        mime="text/csv",
+                        key=f"download_job_{job.id}",
+                        on_click="ignore",
+                    )
+                elif "activities" in result:
+                    st.caption(f"Archived {result['rows']} availability rows from {result['activities']} activities.")
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,13 +1,17 @@
 import streamlit as st
 
-from streamlit_app.db import init_db
-from streamlit_app.db import player as player_db
+from streamlit_app.db.repository import get_repository
 from streamlit_app.utils.authentication import hash_pin
+from streamlit_app.utils.kingdom import render_kingdom_selector
+from streamlit_app.utils.session_memory import track_session
 
 
 def main():
     st.set_page_config(page_title="Edit user profile", page_icon="👤")
-    init_db()
+    render_kingdom_selector()
+    repo = get_repository()
+    repo.init()
+    track_session("profile")
 
     # Ensure session keys exist
     if "player_id" not in st.session_state:
@@ -33,7 +37,7 @@ def main():
             st.session_state.pop(key, None)
         st.rerun()
 
-    player = player_db.get_player_by("player_id", player_id)
+    player = repo.get_player_by("player_id", player_id)
     if not player:
         st.error("Could not load your profile from the database.")
         return
@@ -101,7 +105,7 @@ def main():
             return
 
     # Update database
-    player_db.update_player_profile(
+    repo.update_player_profile(
         player_id=player_id,
         user_game_id=new_user_game_id,
         game_username=new_username.strip(),
@@ -111,7 +115,7 @@ def main():
 
     # PIN changes
     if new_pin:
-        player_db.set_player_pin_hash(player_id, hash_pin(new_pin))
+        repo.set_player_pin_hash(player_id, hash_pin(new_pin))
 
     # Keep session display name in sync
     st.session_state["player_name"] = new_username.strip()
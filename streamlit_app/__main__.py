@@ -0,0 +1,5 @@
+import sys
+
+from streamlit_app.cli import main
+
+sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Command line access to the kingdom database, without starting (or importing) Streamlit.
+
+    python -m streamlit_app export availability -o availability.csv
+    python -m streamlit_app --kingdom 412 summary
+    python -m streamlit_app create-activities activities.csv
+    python -m streamlit_app import-roster roster.csv --dry-run
+    python -m streamlit_app maintenance optimize
+
+Check that it stays light with:
+
+    python -m streamlit_app.utils.importtime streamlit_app.cli --forbid streamlit --forbid pandas
+"""
+import argparse
+import csv
+import sqlite3
+import sys
+from typing import Iterator, TextIO
+
+from streamlit_app.db import DEFAULT_KINGDOM, apply_schema, get_connection, get_db_path, list_kingdoms, use_kingdom
+from streamlit_app.db.backup import restore_all_backups
+
+TRUE_VALUES = {"1", "true", "yes", "y"}
+
+
+def _open_input(path: str) -> TextIO:
+    if path == "-":
+        # A new file object on the stdin descriptor, so closing it leaves sys.stdin open
+        return open(sys.stdin.fileno(), newline="", encoding="utf-8-sig", closefd=False)
+    return open(path, newline="", encoding="utf-8-sig")
+
+
+def _activity_rows(file: TextIO) -> Iterator[tuple[str, str | None, str | None, bool]]:
+    """Rows of an activities CSV with columns name, description, event_date and is_active (all but name optional)."""
+    reader = csv.DictReader(file)
+    if "name" not in (reader.fieldnames or []):
+        raise ValueError("Activities CSV needs a 'name' column.")
+    for record in reader:
+        name = (record.get("name") or "").strip()
+        if not name:
+            raise ValueError(f"Line {reader.line_num}: name is empty.")
+        description = (record.get("description") or "").strip() or None
+        event_date = (record.get("event_date") or "").strip() or None
+        is_active = (record.get("is_active") or "1").strip().lower() in TRUE_VALUES
+        yield name, description, event_date, is_active
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    from streamlit_app.db.export import write_csv
+
+    if args.output in (None, "-"):
+        n_rows = write_csv(args.table, sys.stdout)
+    else:
+        with open(args.output, mode="w", newline="", encoding="utf-8") as f:
+            n_rows = write_csv(args.table, f)
+    print(f"Exported {n_rows} rows of {args.table}.", file=sys.stderr)
+    return 0
+
+
+def cmd_create_activities(args: argparse.Namespace) -> int:
+    from streamlit_app.db.activity import create_activities
+
+    with _open_input(args.csv) as f:
+        n_created = create_activities(list(_activity_rows(f)))
+    print(f"Created {n_created} activities.")
+    return 0
+
+
+def cmd_summary(args: argparse.Namespace) -> int:
+    from streamlit_app.db.availability import get_availability_summary, get_slot_counts
+
+    if args.activity is not None:
+        counts = get_slot_counts(args.activity)
+        print(f"{'slot':<6} {'players':>8}")
+        for slot, count in counts.items():
+            if count or args.all:
+                print(f"{slot:<6} {count:>8}")
+        return 0
+
+    print(f"{'id':>5}  {'date':<10}  {'players':>8}  {'slots':>7}  name")
+    for activity_id, name, event_date, n_players, n_slots in get_availability_summary(include_inactive=args.all):
+        print(f"{activity_id:>5}  {event_date or '-':<10}  {n_players:>8}  {n_slots:>7}  {name}")
+    return 0
+
+
+def cmd_import_roster(args: argparse.Namespace) -> int:
+    from streamlit_app.db.roster_import import import_roster
+
+    with _open_input(args.csv) as f:
+        result = import_roster(f, dry_run=args.dry_run, kingdom=args.kingdom)
+    prefix = "Dry run: would have" if result.dry_run else "Done:"
+    print(
+        f"{prefix} inserted {result.inserted}, updated {result.updated} "
+        f"({result.unchanged} unchanged, {len(result.conflicts)} conflicts)."
+    )
+    for line, reason in result.conflicts:
+        print(f"line {line}: {reason}", file=sys.stderr)
+    return 1 if result.conflicts else 0
+
+
+def cmd_maintenance(args: argparse.Namespace) -> int:
+    from streamlit_app.db.maintenance import get_db_stats, run_maintenance_task
+
+    conn, db_path = get_connection(), get_db_path(args.kingdom)
+    if args.task != "status":
+        ran = run_maintenance_task(conn, args.task, db_path)
+        print(f"{args.task}: {'done' if ran else 'skipped, not worth it'}")
+    for key, value in get_db_stats(conn, db_path).items():
+        print(f"{key:<16} {value}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    # The task and table names are plain constants, importing them doesn't pull in anything heavy
+    from streamlit_app.db.export import EXPORT_TABLES
+    from streamlit_app.db.maintenance import TASKS
+
+    parser = argparse.ArgumentParser(
+        prog="python -m streamlit_app", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--kingdom", default=DEFAULT_KINGDOM, help=f"kingdom to work on, default: {DEFAULT_KINGDOM}")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="stream a table as CSV")
+    export.add_argument("table", choices=EXPORT_TABLES)
+    export.add_argument("-o", "--output", help="file to write, default: stdout")
+    export.set_defaults(func=cmd_export)
+
+    create = commands.add_parser("create-activities", help="create activities from a CSV (name, description, event_date, is_active)")
+    create.add_argument("csv", help="CSV file, or - for stdin")
+    create.set_defaults(func=cmd_create_activities)
+
+    summary = commands.add_parser("summary", help="players and slots per activity, or players per slot of one activity")
+    summary.add_argument("--activity", type=int, help="show players per slot of this activity")
+    summary.add_argument("--all", action="store_true", help="include inactive activities, or empty slots")
+    summary.set_defaults(func=cmd_summary)
+
+    roster = commands.add_parser("import-roster", help="create or update players from a roster CSV")
+    roster.add_argument("csv", help="CSV file, or - for stdin")
+    roster.add_argument("--dry-run", action="store_true", help="check the file without saving anything")
+    roster.set_defaults(func=cmd_import_roster)
+
+    maintenance = commands.add_parser("maintenance", help="run a maintenance task, or show database statistics")
+    maintenance.add_argument("task", choices=["status", *TASKS])
+    maintenance.set_defaults(func=cmd_maintenance)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.kingdom not in list_kingdoms():
+        parser.error(f"unknown kingdom {args.kingdom}, known: {', '.join(list_kingdoms())}")
+
+    try:
+        # Restore before the schema is applied: that creates an empty database, and a cold start
+        # of the app only restores missing files, so it would skip the backup from then on
+        for name, metrics in restore_all_backups().items():
+            print(f"Restored {name} from {metrics['backup']}.", file=sys.stderr)
+        with use_kingdom(args.kingdom):
+            apply_schema()
+            return args.func(args)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
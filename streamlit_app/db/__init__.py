@@ -1,27 +1,177 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import os
 from pathlib import Path
+import re
 import sqlite3
-import streamlit as st
+import sys
+import threading
+from typing import Any, Callable, Iterator, TypeVar
 
-DB_PATH = Path(__file__).resolve().parents[2] / "data" / "data.db"
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+DB_PATH = DATA_DIR / "data.db"     # database of the default kingdom
 
-@st.cache_resource
-def get_connection() -> sqlite3.Connection:
-    """Get a cached SQLite connection. Creates the data dir if needed."""
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+# Every kingdom gets its own database file, so kingdoms never wait on each other's write lock.
+# KINGDOMS lists the kingdoms to serve next to the default one, e.g. "398,412".
+DEFAULT_KINGDOM = os.environ.get("KINGDOM_DEFAULT", "398")
+KINGDOMS = [k.strip() for k in os.environ.get("KINGDOMS", "").split(",") if k.strip()]
+_KINGDOM_RE = re.compile(r"^[A-Za-z0-9_]{1,32}$")
+# Session state that belongs to one kingdom (logins), dropped whenever the session's kingdom changes
+KINGDOM_SESSION_KEYS = (
+    "player_id", "player_name", "login_stage", "login_candidate_player_id", "login_candidate_name",
+    "admin_id", "admin_name", "is_super_admin", "template_choice", "download_job_id",
+)
+# Kingdom set with use_kingdom(), for code running outside a Streamlit session such as the CLI
+_kingdom_override: ContextVar[str | None] = ContextVar("kingdom_override", default=None)
+
+T = TypeVar("T")
+
+# Connection tuning, selected with the KINGDOM_DB_PROFILE environment variable (or root-level secret).
+# "durable" fsyncs every commit, "throughput" trades the last few commits on power loss for faster writes.
+PROFILES: dict[str, dict[str, int | str]] = {
+    "durable": {
+        "synchronous": "FULL",
+        "cache_size": -16_000,          # negative means KiB, so 16 MB
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 30_000,         # ms
+        "wal_autocheckpoint": 1_000,    # pages
+    },
+    "throughput": {
+        "synchronous": "NORMAL",        # still safe against corruption in WAL mode
+        "cache_size": -64_000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30_000,
+        "wal_autocheckpoint": 4_000,
+    },
+}
+DB_PROFILE = os.environ.get("KINGDOM_DB_PROFILE", "durable")
+
+# Prepared statements kept per connection. The app uses a fixed set of query texts (well under this),
+# so every statement is compiled once per connection instead of once per call.
+STATEMENT_CACHE_SIZE = 256
+
+def connect(path: Path = DB_PATH, profile: str | None = None) -> sqlite3.Connection:
+    """Open a new SQLite connection with the app's settings. Creates the data dir if needed."""
+    profile = profile or DB_PROFILE
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown database profile: {profile}")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(
-        DB_PATH,
+        path,
         check_same_thread=False,
         timeout=30,  # wait up to 30s if the DB is busy
+        cached_statements=STATEMENT_CACHE_SIZE,
     )
     conn.execute("PRAGMA foreign_keys = ON;")   # SQLite support for foreign keys is off by default
     conn.execute("PRAGMA journal_mode = WAL;")  # better for concurrent reads/writes
+    for pragma, value in PROFILES[profile].items():
+        conn.execute(f"PRAGMA {pragma} = {value};")
     return conn
 
+# Every process_resource cache by function name, for memory accounting (see memory.py)
+PROCESS_RESOURCES: dict[str, dict[tuple, Any]] = {}
+
+def process_resource(func: Callable[..., T]) -> Callable[..., T]:
+    """
+    Cache func's result per arguments for the lifetime of the process, like st.cache_resource,
+    but usable without Streamlit. Creation is serialised, so every resource is created once.
+    """
+    cache: dict[tuple, T] = PROCESS_RESOURCES.setdefault(f"{func.__module__}.{func.__qualname__}", {})
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        with lock:
+            if args not in cache:
+                cache[args] = func(*args)
+            return cache[args]
+
+    return wrapper
+
+def get_db_path(kingdom: str | None = None) -> Path:
+    """Return the database file of a kingdom, the default kingdom lives in data.db."""
+    kingdom = kingdom or DEFAULT_KINGDOM
+    if not _KINGDOM_RE.match(kingdom):
+        raise ValueError(f"Invalid kingdom: {kingdom}")
+    if kingdom == DEFAULT_KINGDOM:
+        return DB_PATH
+    return DATA_DIR / f"kingdom-{kingdom}.db"
+
+def list_kingdoms() -> list[str]:
+    """Return all kingdoms: the default, the configured ones and any with an existing database file."""
+    kingdoms = {DEFAULT_KINGDOM, *KINGDOMS}
+    if DATA_DIR.is_dir():
+        kingdoms.update(path.stem.removeprefix("kingdom-") for path in DATA_DIR.glob("kingdom-*.db"))
+    return sorted(k for k in kingdoms if _KINGDOM_RE.match(k))
+
+def current_kingdom() -> str:
+    """
+    Kingdom of the current session: ?kingdom=... in the URL, else the session's choice, else the default.
+    Outside a Streamlit script run this is the kingdom set with use_kingdom(), else the default kingdom.
+    Login state is tied to the kingdom it was created in: when the kingdom changes, by URL or by the
+    sidebar selector, the KINGDOM_SESSION_KEYS are cleared and the user has to log in again.
+    """
+    override = _kingdom_override.get()
+    if override is not None:
+        return override
+    if "streamlit" not in sys.modules:
+        return DEFAULT_KINGDOM      # not running under Streamlit, and no reason to import it
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return DEFAULT_KINGDOM
+    requested = st.query_params.get("kingdom")
+    if requested and requested != st.session_state.get("kingdom") and requested in list_kingdoms():
+        st.session_state["kingdom"] = requested
+    kingdom = st.session_state.get("kingdom", DEFAULT_KINGDOM)
+
+    if st.session_state.get("session_kingdom") != kingdom:
+        for key in KINGDOM_SESSION_KEYS:
+            st.session_state.pop(key, None)
+        st.session_state["session_kingdom"] = kingdom
+    return kingdom
+
+@contextmanager
+def use_kingdom(kingdom: str) -> Iterator[None]:
+    """Make kingdom the current kingdom for the duration of the block."""
+    get_db_path(kingdom)    # validates the name
+    token = _kingdom_override.set(kingdom)
+    try:
+        yield
+    finally:
+        _kingdom_override.reset(token)
+
+@process_resource
+def _get_shard_connection(kingdom: str) -> sqlite3.Connection:
+    return connect(get_db_path(kingdom))
+
+def get_connection(kingdom: str | None = None) -> sqlite3.Connection:
+    """Get the cached SQLite connection of a kingdom, by default the current session's kingdom."""
+    return _get_shard_connection(kingdom or current_kingdom())
+
 def init_db() -> None:
-    """Run schema.sql to create tables if they do not exist."""
-    conn = get_connection()
+    """
+    Restore the latest backup on a cold start, run schema.sql to create tables if they do not exist
+    and start background maintenance.
+    """
+    # imported here, both modules depend on this one
+    from .backup import start_backup_service
+    from .maintenance import start_maintenance_scheduler
+
+    start_backup_service()
+    apply_schema()
+    start_maintenance_scheduler()
+
+def apply_schema(kingdom: str | None = None) -> None:
+    """Run schema.sql on a kingdom's database, creating missing tables, indexes and views."""
+    conn = get_connection(kingdom)
     schema_path = Path(__file__).with_name("schema.sql")
     with schema_path.open(mode="r", encoding="utf-8") as f:
         schema_sql = f.read()
     conn.executescript(schema_sql)
-    conn.commit()
\ No newline at end of file
+    conn.commit()
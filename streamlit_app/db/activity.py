@@ -1,7 +1,15 @@
 from datetime import datetime, UTC
-from typing import Any
+import sqlite3
+from typing import Iterable
 
 from . import get_connection
+from .records import ActivityRecord
+
+SELECT_ALL_ACTIVITIES = f"""
+    SELECT {', '.join(ActivityRecord.__slots__)}
+    FROM activity
+    ORDER BY created_at DESC
+"""
 
 
 def get_active_activities() -> list[tuple[int, str, str | None]]:
@@ -41,30 +49,36 @@ def create_activity(
          event_date, int(is_active),
          datetime.now(UTC).isoformat(timespec="seconds")),
     )
+    conn.commit()
 
 
-def get_all_activities() -> list[dict[str, Any]]:
-    """Return all activities with full info."""
+def create_activities(activities: Iterable[tuple[str, str | None, str | None, bool]]) -> int:
+    """
+    Add many activities, given as (name, description, event_date, is_active), in one transaction.
+    Returns the number of activities created.
+    """
+    now = datetime.now(UTC).isoformat(timespec="seconds")
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT id, name, description, event_date, is_active, created_at
-        FROM activity
-        ORDER BY created_at DESC
-        """
-    )
-    rows = cur.fetchall()
-    result: list[dict[str, Any]] = []
-    for row in rows:
-        result.append(
-            {
-                "id": row[0],
-                "name": row[1],
-                "description": row[2],
-                "event_date": row[3],
-                "is_active": row[4],
-                "created_at": row[5],
-            }
+    try:
+        cur.executemany(
+            """
+            INSERT INTO activity (name, description, event_date, is_active, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            ((name, description, event_date, int(is_active), now) for name, description, event_date, is_active in activities),
         )
-    return result
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return cur.rowcount
+
+
+def get_all_activities() -> list[ActivityRecord]:
+    """Return all activities with full info."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.row_factory = ActivityRecord.from_row
+    cur.execute(SELECT_ALL_ACTIVITIES)
+    return cur.fetchall()
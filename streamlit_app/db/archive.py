@@ -0,0 +1,240 @@
+from contextlib import contextmanager
+from datetime import date, datetime, UTC
+from itertools import groupby
+from pathlib import Path
+import sqlite3
+from typing import Any, Iterator
+
+from . import DB_PATH, connect, current_kingdom, get_db_path
+from .availability import log_changes, mask_to_slots, slots_to_mask
+
+
+def get_archive_path(kingdom: str | None = None) -> Path:
+    """Return the archive file of a kingdom, by default the current session's kingdom."""
+    kingdom = kingdom or current_kingdom()
+    db_path = get_db_path(kingdom)
+    if db_path == DB_PATH:
+        return db_path.with_name("archive.db")
+    return db_path.with_name(f"archive-{kingdom}.db")
+
+
+@contextmanager
+def _archive_connection(kingdom: str | None) -> Iterator[sqlite3.Connection]:
+    """
+    A connection of its own to the kingdom's database, with the archive attached as schema "archive".
+    Not the shared connection: other sessions' commits must not commit a move halfway, and
+    rolling back a failed move must not roll back their writes.
+    """
+    kingdom = kingdom or current_kingdom()
+    conn = connect(get_db_path(kingdom))
+    try:
+        conn.execute("ATTACH DATABASE ? AS archive", (str(get_archive_path(kingdom)),))
+        schema_path = Path(__file__).with_name("archive_schema.sql")
+        conn.executescript(schema_path.read_text(encoding="utf-8"))
+        yield conn
+    finally:
+        conn.close()
+
+
+def _log_archived_slots(cur: sqlite3.Cursor, activity_id: int, now: str) -> None:
+    """Log the (player_id, slot) rows left in cur, ordered by player, as removed from this activity."""
+    for player_id, rows in groupby(cur.fetchall(), key=lambda row: row[0]):
+        log_changes(cur, player_id, activity_id, [], [slot for _, slot in rows], now)
+
+
+def _read_only_archive(kingdom: str | None) -> sqlite3.Connection | None:
+    """Open the archive file read-only, or None if nothing has been archived yet."""
+    archive_path = get_archive_path(kingdom)
+    if not archive_path.exists():
+        return None
+    return sqlite3.connect(f"file:{archive_path}?mode=ro", uri=True)
+
+
+def archive_activities(before_date: str | None = None, kingdom: str | None = None) -> tuple[int, int]:
+    """
+    Move availability of inactive activities, and of activities dated before
+    before_date ("YYYY-MM-DD", defaults to today), into the archive database.
+    Returns (number of activities archived, number of availability rows moved).
+    """
+    before_date = before_date or date.today().isoformat()
+    now = datetime.now(UTC).isoformat(timespec="seconds")
+
+    with _archive_connection(kingdom) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT id FROM main.activity
+            WHERE (is_active = 0 OR event_date < ?)
+              AND id IN (SELECT DISTINCT activity_id FROM main.effective_availability)
+            """,
+            (before_date,),
+        )
+        activity_ids = [row[0] for row in cur.fetchall()]
+        if not activity_ids:
+            return 0, 0
+
+        n_rows = 0
+        try:
+            for activity_id in activity_ids:
+                cur.execute(
+                    """
+                    SELECT player_id, slot FROM main.effective_availability
+                    WHERE activity_id = ?
+                    ORDER BY player_id
+                    """,
+                    (activity_id,),
+                )
+                _log_archived_slots(cur, activity_id, now)
+                cur.execute(
+                    """
+                    INSERT OR REPLACE INTO archive.activity
+                        (id, name, description, event_date, is_active, created_at, archived_at)
+                    SELECT id, name, description, event_date, is_active, created_at, ?
+                    FROM main.activity
+                    WHERE id = ?
+                    """,
+                    (now, activity_id),
+                )
+                cur.execute(
+                    """
+                    INSERT OR REPLACE INTO archive.availability (player_id, activity_id, slot, created_at)
+                    SELECT player_id, activity_id, slot, created_at
+                    FROM main.effective_availability
+                    WHERE activity_id = ?
+                    """,
+                    (activity_id,),
+                )
+                n_rows += cur.rowcount
+                cur.execute("DELETE FROM main.availability WHERE activity_id = ?", (activity_id,))
+                cur.execute("DELETE FROM main.template_use WHERE activity_id = ?", (activity_id,))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    return len(activity_ids), n_rows
+
+
+def get_archived_activities(kingdom: str | None = None) -> list[dict[str, Any]]:
+    """Return all archived activities, most recently archived first."""
+    conn = _read_only_archive(kingdom)
+    if conn is None:
+        return []
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT a.id, a.name, a.event_date, a.archived_at, COUNT(av.slot)
+            FROM activity a
+            LEFT JOIN availability av ON av.activity_id = a.id
+            GROUP BY a.id
+            ORDER BY a.archived_at DESC, a.id DESC
+            """
+        )
+        rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    return [
+        {
+            "id": row[0],
+            "name": row[1],
+            "event_date": row[2],
+            "archived_at": row[3],
+            "n_rows": row[4],
+        }
+        for row in rows
+    ]
+
+
+def get_archived_availability(activity_id: int, kingdom: str | None = None) -> list[tuple[int, str]]:
+    """Return (player_id, slot) pairs archived for this activity."""
+    conn = _read_only_archive(kingdom)
+    if conn is None:
+        return []
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT player_id, slot
+            FROM availability
+            WHERE activity_id = ?
+            ORDER BY player_id, slot
+            """,
+            (activity_id,),
+        )
+        return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def restore_activity(activity_id: int, kingdom: str | None = None) -> int:
+    """
+    Move the archived availability of an activity back into the hot tables. Players who applied
+    a template to the activity since it was archived get the archived slots as template overrides,
+    so a (player, activity) pair is still stored in one place only.
+    Returns the number of slots restored, not counting slots the player has again by now.
+    """
+    now = datetime.now(UTC).isoformat(timespec="seconds")
+
+    with _archive_connection(kingdom) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT tu.player_id, t.slot_mask, tu.added_mask, tu.removed_mask
+                FROM main.template_use tu
+                JOIN main.availability_template t ON t.id = tu.template_id
+                WHERE tu.activity_id = ?
+                """,
+                (activity_id,),
+            )
+            template_uses = {row[0]: row[1:] for row in cur.fetchall()}
+            cur.execute("SELECT player_id, slot FROM main.availability WHERE activity_id = ?", (activity_id,))
+            existing = set(cur.fetchall())
+            cur.execute(
+                """
+                SELECT player_id, slot, created_at FROM archive.availability
+                WHERE activity_id = ?
+                ORDER BY player_id
+                """,
+                (activity_id,),
+            )
+            archived = cur.fetchall()
+
+            n_rows = 0
+            for player_id, rows in groupby(archived, key=lambda row: row[0]):
+                rows = list(rows)
+                if player_id in template_uses:
+                    template_mask, added_mask, removed_mask = template_uses[player_id]
+                    current = (template_mask | added_mask) & ~removed_mask
+                    new_mask = current | slots_to_mask(slot for _, slot, _ in rows)
+                    added = mask_to_slots(new_mask & ~current)
+                    if added:
+                        cur.execute(
+                            """
+                            UPDATE main.template_use SET added_mask = ?, removed_mask = ?
+                            WHERE player_id = ? AND activity_id = ?
+                            """,
+                            (new_mask & ~template_mask, template_mask & ~new_mask, player_id, activity_id),
+                        )
+                else:
+                    rows = [row for row in rows if (player_id, row[1]) not in existing]
+                    cur.executemany(
+                        "INSERT INTO main.availability (player_id, activity_id, slot, created_at) VALUES (?, ?, ?, ?)",
+                        [(player_id, activity_id, slot, created_at) for _, slot, created_at in rows],
+                    )
+                    added = [slot for _, slot, _ in rows]
+                log_changes(cur, player_id, activity_id, added, [], now)
+                n_rows += len(added)
+
+            cur.execute("DELETE FROM archive.availability WHERE activity_id = ?", (activity_id,))
+            cur.execute("DELETE FROM archive.activity WHERE id = ?", (activity_id,))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    return n_rows
@@ -0,0 +1,18 @@
+-- Cold storage for finished activities, attached to the main connection as "archive"
+CREATE TABLE IF NOT EXISTS archive.activity (
+    id INTEGER PRIMARY KEY,     -- same id as in the hot activity table
+    name TEXT NOT NULL,
+    description TEXT,
+    event_date TEXT,            -- "YYYY-MM-DD"
+    is_active INTEGER NOT NULL,
+    created_at TEXT NOT NULL,   -- "YYYY-MM-DDTHH:MM"
+    archived_at TEXT NOT NULL   -- "YYYY-MM-DDTHH:MM"
+);
+
+CREATE TABLE IF NOT EXISTS archive.availability (
+    player_id INT NOT NULL,
+    activity_id INT NOT NULL,
+    slot TEXT NOT NULL,         -- "HH:MM"
+    created_at TEXT NOT NULL,   -- "YYYY-MM-DDTHH:MM"
+    PRIMARY KEY (activity_id, player_id, slot)
+) WITHOUT ROWID;
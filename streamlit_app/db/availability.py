@@ -1,6 +1,47 @@
 from datetime import datetime, UTC
+import sqlite3
+from typing import Iterable, Iterator
 
 from . import get_connection
+from .records import AvailabilityRecord, iter_rows
+
+# Half-hour slots of a day, in UTC
+ALL_SLOTS = [f"{h:02d}:{m:02d}" for h in range(0, 24) for m in (0, 30)]
+SLOT_INDEX = {slot: i for i, slot in enumerate(ALL_SLOTS)}
+
+
+def slots_to_mask(slots: Iterable[str]) -> int:
+    """Bitmask with bit i set for every slot ALL_SLOTS[i]. Raises ValueError for unknown slots."""
+    mask = 0
+    for slot in slots:
+        if slot not in SLOT_INDEX:
+            raise ValueError(f"Unknown slot: {slot}")
+        mask |= 1 << SLOT_INDEX[slot]
+    return mask
+
+
+def mask_to_slots(mask: int) -> list[str]:
+    """Slots of a bitmask, in order."""
+    return [slot for i, slot in enumerate(ALL_SLOTS) if mask >> i & 1]
+
+
+def log_changes(
+        cur: sqlite3.Cursor,
+        player_id: int,
+        activity_id: int,
+        added: Iterable[str],
+        removed: Iterable[str],
+        now: str,
+) -> None:
+    """Append added and removed slots to availability_log, as part of the caller's transaction."""
+    cur.executemany(
+        """
+        INSERT INTO availability_log (player_id, activity_id, slot, op, changed_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        [(player_id, activity_id, slot, "+", now) for slot in added]
+        + [(player_id, activity_id, slot, "-", now) for slot in removed],
+    )
 
 
 def save_availability(
@@ -9,38 +50,76 @@ def save_availability(
         slots: list[str],
 ) -> None:
     """
-    Remove any previous saved slots for this (user, event) combination and save new.
+    Save the slots for this (user, event) combination. Only the difference with the
+    previously saved slots is written, and every added or removed slot is appended to availability_log.
+    If the player applied a template to this activity, the difference is stored as template overrides.
     """
     conn = get_connection()
     cur = conn.cursor()
 
     cur.execute(
-        "DELETE FROM availability WHERE player_id = ? AND activity_id = ?",
+        """
+        SELECT t.slot_mask, tu.added_mask, tu.removed_mask
+        FROM template_use tu
+        JOIN availability_template t ON t.id = tu.template_id
+        WHERE tu.player_id = ? AND tu.activity_id = ?
+        """,
         (player_id, activity_id),
     )
+    template_use = cur.fetchone()
+    if template_use is not None:
+        template_mask, added_mask, removed_mask = template_use
+        current = set(mask_to_slots((template_mask | added_mask) & ~removed_mask))
+    else:
+        cur.execute(
+            "SELECT slot FROM availability WHERE player_id = ? AND activity_id = ?",
+            (player_id, activity_id),
+        )
+        current = {row[0] for row in cur.fetchall()}
+    new = set(slots)
+    added = sorted(new - current)
+    removed = sorted(current - new)
+    if not added and not removed:
+        return
 
     now = datetime.now(UTC).isoformat(timespec="seconds")
 
-    if slots:
-        cur.executemany(
-            """
-            INSERT INTO availability (player_id, activity_id, slot, created_at)
-            VALUES (?, ?, ?, ?) 
-            """,
-            [(player_id, activity_id, slot, now) for slot in slots]
-        )
-
-    conn.commit()
+    try:
+        if template_use is not None:
+            new_mask = slots_to_mask(new)
+            cur.execute(
+                "UPDATE template_use SET added_mask = ?, removed_mask = ? WHERE player_id = ? AND activity_id = ?",
+                (new_mask & ~template_mask, template_mask & ~new_mask, player_id, activity_id),
+            )
+        else:
+            if removed:
+                cur.executemany(
+                    "DELETE FROM availability WHERE player_id = ? AND activity_id = ? AND slot = ?",
+                    [(player_id, activity_id, slot) for slot in removed],
+                )
+            if added:
+                cur.executemany(
+                    """
+                    INSERT INTO availability (player_id, activity_id, slot, created_at)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    [(player_id, activity_id, slot, now) for slot in added]
+                )
+        log_changes(cur, player_id, activity_id, added, removed, now)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
 
 
 def get_availability_slots(player_id: int, activity_id: int) -> list[str]:
-    """Return list of slot strings for this player & activity."""
+    """Return list of slot strings for this player & activity, with templates expanded."""
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
         """
         SELECT slot
-        FROM availability
+        FROM effective_availability
         WHERE player_id = ? AND activity_id = ?
         ORDER BY slot
         """,
@@ -48,3 +127,53 @@ def get_availability_slots(player_id: int, activity_id: int) -> list[str]:
     )
     rows = cur.fetchall()
     return [row[0] for row in rows]
+
+
+def iter_availability(activity_id: int | None = None) -> Iterator[AvailabilityRecord]:
+    """Stream availability rows, for one activity or all of them, without loading them all at once."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.row_factory = AvailabilityRecord.from_row
+    if activity_id is None:
+        cur.execute(
+            "SELECT player_id, activity_id, slot FROM effective_availability ORDER BY activity_id, player_id, slot"
+        )
+    else:
+        cur.execute(
+            """
+            SELECT player_id, activity_id, slot FROM effective_availability
+            WHERE activity_id = ?
+            ORDER BY player_id, slot
+            """,
+            (activity_id,),
+        )
+    yield from iter_rows(cur)
+
+
+def get_availability_summary(include_inactive: bool = False) -> list[tuple[int, str, str | None, int, int]]:
+    """Return (activity_id, name, event_date, players, slots given) per activity, by date."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT a.id, a.name, a.event_date, COUNT(DISTINCT ea.player_id), COUNT(ea.slot)
+        FROM activity a
+        LEFT JOIN effective_availability ea ON ea.activity_id = a.id
+        {"" if include_inactive else "WHERE a.is_active = 1"}
+        GROUP BY a.id
+        ORDER BY a.event_date, a.id
+        """
+    )
+    return cur.fetchall()
+
+
+def get_slot_counts(activity_id: int) -> dict[str, int]:
+    """Return the number of players available per slot of an activity, for every slot in ALL_SLOTS."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT slot, COUNT(*) FROM effective_availability WHERE activity_id = ? GROUP BY slot",
+        (activity_id,),
+    )
+    counts = dict(cur.fetchall())
+    return {slot: counts.get(slot, 0) for slot in ALL_SLOTS}
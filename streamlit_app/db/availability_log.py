@@ -0,0 +1,176 @@
+"""
+History of availability changes.
+
+save_availability appends every added ('+') or removed ('-') slot to availability_log, while the
+effective_availability view holds the current state. Old log entries are periodically folded into
+availability_log_base by compact_log, so the log stays bounded and history is kept
+back to availability_log_compaction.compacted_until.
+"""
+from datetime import datetime, timedelta, UTC
+import os
+import sqlite3
+
+from . import get_connection
+from .records import AvailabilityChangeRecord, AvailabilityRecord, iter_rows
+
+# Log entries older than this are folded into the base state by the maintenance scheduler
+LOG_RETENTION_DAYS = float(os.environ.get("KINGDOM_AVAILABILITY_LOG_RETENTION_DAYS", 90))
+
+
+class HistoryCompactedError(ValueError):
+    """The requested history has been compacted away."""
+
+
+def _timestamp(at: datetime | str) -> str:
+    if isinstance(at, str):
+        return at
+    return at.astimezone(UTC).isoformat(timespec="seconds")
+
+
+def _compaction(cur: sqlite3.Cursor) -> tuple[int, str]:
+    cur.execute("SELECT watermark, compacted_until FROM availability_log_compaction WHERE id = 1")
+    return cur.fetchone()
+
+
+def get_watermark(conn: sqlite3.Connection | None = None) -> int:
+    """Return the id of the latest change, to pass to get_changes_since later."""
+    conn = conn or get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM availability_log")
+    (latest,) = cur.fetchone()
+    watermark, _ = _compaction(cur)
+    return max(latest, watermark)
+
+
+def get_changes_since(
+        watermark: int,
+        limit: int | None = None,
+        conn: sqlite3.Connection | None = None,
+) -> tuple[list[AvailabilityChangeRecord], int]:
+    """
+    Return the changes after watermark, oldest first, and the watermark to continue from.
+    Raises HistoryCompactedError if changes after watermark were compacted: resync from the current state.
+    """
+    conn = conn or get_connection()
+    cur = conn.cursor()
+    compacted_watermark, compacted_until = _compaction(cur)
+    if watermark < compacted_watermark:
+        raise HistoryCompactedError(f"Changes before {compacted_until} (id {compacted_watermark}) were compacted.")
+
+    cur.row_factory = AvailabilityChangeRecord.from_row
+    cur.execute(
+        """
+        SELECT id, player_id, activity_id, slot, op, changed_at
+        FROM availability_log
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+        """,
+        (watermark, -1 if limit is None else limit),
+    )
+    changes = list(iter_rows(cur))
+    return changes, changes[-1].id if changes else watermark
+
+
+def get_availability_as_of(
+        at: datetime | str,
+        activity_id: int | None = None,
+        conn: sqlite3.Connection | None = None,
+) -> list[AvailabilityRecord]:
+    """
+    Return availability as it was at the given time, for one activity or all of them.
+    Raises HistoryCompactedError if that moment is older than the retained history.
+    """
+    at = _timestamp(at)
+    conn = conn or get_connection()
+    cur = conn.cursor()
+    watermark, compacted_until = _compaction(cur)
+    if at < compacted_until:
+        raise HistoryCompactedError(f"History before {compacted_until} was compacted.")
+
+    activity_filter = "" if activity_id is None else "AND activity_id = :activity_id"
+    cur.execute(
+        f"SELECT player_id, activity_id, slot FROM availability_log_base WHERE 1 {activity_filter}",
+        {"activity_id": activity_id},
+    )
+    state = set(iter_rows(cur))
+
+    # The row with MAX(id) supplies the bare op column: the last change per slot before `at` wins
+    cur.execute(
+        f"""
+        SELECT player_id, activity_id, slot, op, MAX(id)
+        FROM availability_log
+        WHERE id > :watermark AND changed_at <= :at {activity_filter}
+        GROUP BY player_id, activity_id, slot
+        """,
+        {"watermark": watermark, "at": at, "activity_id": activity_id},
+    )
+    for player_id, act_id, slot, op, _ in iter_rows(cur):
+        if op == "+":
+            state.add((player_id, act_id, slot))
+        else:
+            state.discard((player_id, act_id, slot))
+
+    return [AvailabilityRecord(*row) for row in sorted(state, key=lambda r: (r[1], r[0], r[2]))]
+
+
+def compact_log(
+        before: datetime | str | None = None,
+        conn: sqlite3.Connection | None = None,
+) -> int:
+    """
+    Fold log entries older than `before` (default: LOG_RETENTION_DAYS ago) into the base state
+    and delete them. Returns the number of log entries compacted.
+    """
+    before = _timestamp(before or datetime.now(UTC) - timedelta(days=LOG_RETENTION_DAYS))
+    conn = conn or get_connection()
+    cur = conn.cursor()
+    watermark, compacted_until = _compaction(cur)
+    if before <= compacted_until:
+        return 0
+
+    cur.execute(
+        "SELECT MAX(id) FROM availability_log WHERE id > ? AND changed_at < ?",
+        (watermark, before),
+    )
+    (new_watermark,) = cur.fetchone()
+
+    try:
+        if new_watermark is not None:
+            latest = """
+                SELECT player_id, activity_id, slot, op, MAX(id)
+                FROM availability_log
+                WHERE id > ? AND id <= ?
+                GROUP BY player_id, activity_id, slot
+            """
+            cur.execute(
+                f"""
+                INSERT OR IGNORE INTO availability_log_base (player_id, activity_id, slot)
+                SELECT player_id, activity_id, slot FROM ({latest}) WHERE op = '+'
+                """,
+                (watermark, new_watermark),
+            )
+            cur.execute(
+                f"""
+                DELETE FROM availability_log_base
+                WHERE (player_id, activity_id, slot) IN (
+                    SELECT player_id, activity_id, slot FROM ({latest}) WHERE op = '-'
+                )
+                """,
+                (watermark, new_watermark),
+            )
+            cur.execute("DELETE FROM availability_log WHERE id <= ?", (new_watermark,))
+            n_compacted = cur.rowcount
+        else:
+            new_watermark, n_compacted = watermark, 0
+
+        cur.execute(
+            "UPDATE availability_log_compaction SET watermark = ?, compacted_until = ? WHERE id = 1",
+            (new_watermark, before),
+        )
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+    return n_compacted
@@ -0,0 +1,248 @@
+from datetime import datetime, UTC
+import gzip
+import hashlib
+import logging
+import os
+from pathlib import Path
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from . import DATA_DIR, DB_PATH, connect, get_db_path, list_kingdoms, process_resource
+from .archive import get_archive_path
+
+logger = logging.getLogger(__name__)
+
+# Settings come from environment variables; Streamlit also exposes root-level secrets this way.
+# Point KINGDOM_BACKUP_DIR at storage that survives the app's volume, the default does not.
+BACKUP_DIR = Path(os.environ.get("KINGDOM_BACKUP_DIR", DATA_DIR / "backups"))
+BACKUP_INTERVAL_MINUTES = float(os.environ.get("KINGDOM_BACKUP_INTERVAL_MINUTES", 15))
+BACKUP_KEEP = int(os.environ.get("KINGDOM_BACKUP_KEEP", 10))
+
+# Backups are named "<database file stem>-<UTC timestamp>.db.gz", e.g. "kingdom-412-20250101T000000000000Z.db.gz"
+BACKUP_SUFFIX = ".db.gz"
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open(mode="rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _checksum_path(backup_path: Path) -> Path:
+    return backup_path.with_name(backup_path.name + ".sha256")
+
+
+def _backup_stem(backup_path: Path) -> str:
+    """Stem of the database file a backup was made of."""
+    return backup_path.name.removesuffix(BACKUP_SUFFIX).rsplit("-", 1)[0]
+
+
+def list_backups(db_path: Path | None = None, backup_dir: Path = BACKUP_DIR) -> list[Path]:
+    """Return the backups of one database file (or of all of them) in backup_dir, newest first."""
+    if not backup_dir.is_dir():
+        return []
+    backups = backup_dir.glob(f"*{BACKUP_SUFFIX}")
+    if db_path is not None:     # exact match, "archive" must not pick up "archive-412" backups
+        backups = (path for path in backups if _backup_stem(path) == db_path.stem)
+    return sorted(backups, reverse=True)
+
+
+def _backed_up_db_paths(backup_dir: Path = BACKUP_DIR) -> list[Path]:
+    """Return the database files that have at least one backup."""
+    stems = {_backup_stem(path) for path in list_backups(backup_dir=backup_dir)}
+    return sorted(DATA_DIR / f"{stem}.db" for stem in stems)
+
+
+def create_backup(
+        db_path: Path = DB_PATH,
+        conn: sqlite3.Connection | None = None,
+        backup_dir: Path = BACKUP_DIR,
+        keep: int = BACKUP_KEEP,
+) -> Path:
+    """
+    Write a compressed, checksummed copy of the database at db_path to backup_dir.
+    Keeps the newest `keep` backups of that database and returns the path of the new one.
+    """
+    own_conn = conn is None
+    conn = conn or connect(db_path)
+    backup_dir.mkdir(parents=True, exist_ok=True)
+
+    stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%S%fZ")
+    backup_path = backup_dir / f"{db_path.stem}-{stamp}{BACKUP_SUFFIX}"
+    raw_path = backup_dir / f".{db_path.stem}-{stamp}.db.tmp"
+    gz_tmp_path = backup_dir / f".{db_path.stem}-{stamp}.gz.tmp"
+
+    try:
+        # Fold the WAL into the main file first so the copy is small and self-contained
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+        target = sqlite3.connect(raw_path)
+        try:
+            conn.backup(target)
+        finally:
+            target.close()
+
+        with raw_path.open(mode="rb") as src, gzip.open(gz_tmp_path, mode="wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+
+        _checksum_path(backup_path).write_text(_sha256(gz_tmp_path), encoding="utf-8")
+        os.replace(gz_tmp_path, backup_path)    # the backup only appears once it is complete
+    finally:
+        raw_path.unlink(missing_ok=True)
+        gz_tmp_path.unlink(missing_ok=True)
+        if own_conn:
+            conn.close()
+
+    for old in list_backups(db_path, backup_dir)[keep:]:
+        old.unlink(missing_ok=True)
+        _checksum_path(old).unlink(missing_ok=True)
+
+    return backup_path
+
+
+def verify_backup(backup_path: Path) -> bool:
+    """Check a backup against its checksum file."""
+    checksum_path = _checksum_path(backup_path)
+    if not checksum_path.exists():
+        return False
+    return _sha256(backup_path) == checksum_path.read_text(encoding="utf-8").strip()
+
+
+def restore_latest_backup(
+        db_path: Path = DB_PATH,
+        backup_dir: Path = BACKUP_DIR,
+) -> dict[str, Any] | None:
+    """
+    Restore the newest valid backup if the database file does not exist yet.
+    Returns timing metrics of the restore, or None if nothing was restored.
+    """
+    if db_path.exists():
+        return None
+
+    start = time.perf_counter()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = db_path.with_name(db_path.name + ".restore")
+
+    for backup_path in list_backups(db_path, backup_dir):
+        verify_start = time.perf_counter()
+        if not verify_backup(backup_path):
+            continue
+        verify_seconds = time.perf_counter() - verify_start
+
+        decompress_start = time.perf_counter()
+        try:
+            with gzip.open(backup_path, mode="rb") as src, tmp_path.open(mode="wb") as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+            check = sqlite3.connect(tmp_path)
+            try:
+                (result,) = check.execute("PRAGMA quick_check;").fetchone()
+            finally:
+                check.close()
+        except (OSError, sqlite3.DatabaseError):
+            tmp_path.unlink(missing_ok=True)
+            continue
+        if result != "ok":
+            tmp_path.unlink(missing_ok=True)
+            continue
+        decompress_seconds = time.perf_counter() - decompress_start
+
+        for suffix in ("-wal", "-shm"):   # leftovers would be replayed on top of the restored file
+            db_path.with_name(db_path.name + suffix).unlink(missing_ok=True)
+        os.replace(tmp_path, db_path)
+        return {
+            "backup": backup_path.name,
+            "size_bytes": db_path.stat().st_size,
+            "verify_seconds": round(verify_seconds, 3),
+            "decompress_seconds": round(decompress_seconds, 3),
+            "total_seconds": round(time.perf_counter() - start, 3),
+        }
+
+    return None
+
+
+def restore_all_backups(backup_dir: Path = BACKUP_DIR) -> dict[str, dict[str, Any]]:
+    """Restore every missing kingdom database and archive that has a backup. Returns restore metrics per file name."""
+    metrics = {}
+    for db_path in _backed_up_db_paths(backup_dir):
+        restored = restore_latest_backup(db_path, backup_dir)
+        if restored:
+            metrics[db_path.name] = restored
+    return metrics
+
+
+def _on_data_volume(backup_dir: Path) -> bool:
+    return backup_dir.resolve().is_relative_to(DATA_DIR.resolve())
+
+
+def _backup_sources() -> list[Path]:
+    """Every file to back up: the database of each kingdom and its archive, if they exist."""
+    paths = []
+    for kingdom in list_kingdoms():
+        paths.extend(path for path in (get_db_path(kingdom), get_archive_path(kingdom)) if path.exists())
+    return paths
+
+
+class BackupService:
+    """Restores the newest backups on a cold start and backs up every kingdom periodically."""
+
+    def __init__(self, interval_minutes: float = BACKUP_INTERVAL_MINUTES) -> None:
+        self.interval_seconds = interval_minutes * 60
+        if _on_data_volume(BACKUP_DIR):
+            logger.warning(
+                "Backups are written to %s, on the same volume as the databases. "
+                "Set KINGDOM_BACKUP_DIR to persistent storage, or a lost volume loses the backups too.",
+                BACKUP_DIR,
+            )
+        self.restore_metrics = restore_all_backups()
+        self.last_backup_at: str | None = None
+        self.last_error: str | None = None
+
+        self._lock = threading.Lock()
+        # One connection per database file. data_version only changes when *other* connections commit,
+        # which is exactly what we need to skip unchanged databases.
+        self._conns: dict[str, sqlite3.Connection] = {}
+        self._backed_up_versions: dict[str, int] = {}
+
+        if self.interval_seconds > 0:
+            threading.Thread(target=self._run, name="db-backup", daemon=True).start()
+
+    def backup_now(self, force: bool = True) -> list[Path]:
+        """
+        Back up every kingdom's database and archive, skipping unchanged files unless forced.
+        Returns the new backups.
+        """
+        written = []
+        errors = []
+        with self._lock:
+            for db_path in _backup_sources():
+                conn = self._conns.get(db_path.name)
+                if conn is None:
+                    conn = self._conns[db_path.name] = connect(db_path)
+                (version,) = conn.execute("PRAGMA data_version;").fetchone()
+                if not force and version == self._backed_up_versions.get(db_path.name):
+                    continue
+                try:
+                    written.append(create_backup(db_path, conn))
+                except (OSError, sqlite3.Error) as e:
+                    errors.append(f"{db_path.name}: {e}")
+                    continue
+                self._backed_up_versions[db_path.name] = version
+            if written:
+                self.last_backup_at = datetime.now(UTC).isoformat(timespec="seconds")
+            self.last_error = "; ".join(errors) or None
+        return written
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval_seconds)
+            self.backup_now(force=False)
+
+
+@process_resource
+def start_backup_service() -> BackupService:
+    """Start the process-wide backup service. Must run before the first connection is opened."""
+    return BackupService()
@@ -1,9 +1,59 @@
-import pandas as pd
+import csv
+import sqlite3
+from typing import Callable, TextIO, TYPE_CHECKING
 
 from . import get_connection
+from .records import iter_rows
+from .snapshot import get_snapshot
 
+if TYPE_CHECKING:
+    import pandas as pd
 
-def get_table_df(table_name: str) -> pd.DataFrame:
-    """Return the full contents of a table as a DataFrame."""
-    conn = get_connection()
-    return pd.read_sql(f"SELECT * FROM {table_name}", conn)
+EXPORT_TABLES = ("player", "activity", "availability", "availability_log")
+PROGRESS_EVERY_ROWS = 1000
+
+# Tables exported from a query instead of as stored: availability includes slots given by templates
+EXPORT_QUERIES = {
+    "availability": "SELECT player_id, activity_id, slot, created_at FROM effective_availability",
+}
+
+
+def export_query(table_name: str) -> str:
+    """Return the query exporting a table."""
+    return EXPORT_QUERIES.get(table_name, f"SELECT * FROM {table_name}")
+
+
+def get_table_df(table_name: str, snapshot: bool = False) -> "pd.DataFrame":
+    """
+    Return the full contents of a table as a DataFrame.
+    With snapshot=True the table is read from the reporting snapshot instead of the live database.
+    """
+    import pandas as pd     # heavy, and only the admin pages need it
+
+    conn = get_snapshot().conn if snapshot else get_connection()
+    return pd.read_sql(export_query(table_name), conn)
+
+
+def write_csv(
+        table_name: str,
+        file: TextIO,
+        conn: sqlite3.Connection | None = None,
+        progress: Callable[[int], None] | None = None,
+) -> int:
+    """
+    Stream a table to file as CSV, a batch of rows at a time, and return the number of rows written.
+    progress, if given, is called with the number of rows written so far every PROGRESS_EVERY_ROWS rows.
+    """
+    if table_name not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table: {table_name}")
+    cur = (conn or get_connection()).cursor()
+    cur.execute(export_query(table_name))
+    writer = csv.writer(file)
+    writer.writerow([column[0] for column in cur.description])
+    n_rows = 0
+    for row in iter_rows(cur):
+        writer.writerow(row)
+        n_rows += 1
+        if progress is not None and n_rows % PROGRESS_EVERY_ROWS == 0:
+            progress(n_rows)
+    return n_rows
@@ -0,0 +1,124 @@
+from datetime import datetime, UTC
+import json
+import sqlite3
+from typing import Any
+
+from .records import JobRecord
+
+_SELECT_JOB = f"SELECT {', '.join(JobRecord.__slots__)} FROM job"
+
+
+def _now() -> str:
+    return datetime.now(UTC).isoformat(timespec="seconds")
+
+
+def params_key(params: dict[str, Any]) -> str:
+    """Canonical JSON of job parameters, identical parameters give identical keys."""
+    return json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+def create_job(conn: sqlite3.Connection, name: str, params: dict[str, Any], created_by: str | None) -> tuple[int, bool]:
+    """
+    Queue a job. If an identical job is already queued or running, return that one instead.
+    Returns (job_id, created).
+    """
+    key = params_key(params)
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "INSERT INTO job (name, params, status, created_by, created_at) VALUES (?, ?, 'queued', ?, ?)",
+            (name, key, created_by, _now()),
+        )
+        conn.commit()
+        return cur.lastrowid, True
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        cur.execute(
+            "SELECT id FROM job WHERE name = ? AND params = ? AND status IN ('queued', 'running')",
+            (name, key),
+        )
+        (job_id,) = cur.fetchone()
+        return job_id, False
+
+
+def get_job(conn: sqlite3.Connection, job_id: int) -> JobRecord | None:
+    cur = conn.cursor()
+    cur.row_factory = JobRecord.from_row
+    cur.execute(f"{_SELECT_JOB} WHERE id = ?", (job_id,))
+    return cur.fetchone()
+
+
+def list_jobs(conn: sqlite3.Connection, limit: int = 20) -> list[JobRecord]:
+    """Return the most recent jobs, newest first."""
+    cur = conn.cursor()
+    cur.row_factory = JobRecord.from_row
+    cur.execute(f"{_SELECT_JOB} ORDER BY id DESC LIMIT ?", (limit,))
+    return cur.fetchall()
+
+
+def start_job(conn: sqlite3.Connection, job_id: int) -> bool:
+    """Mark a queued job as running. Returns False if it was cancelled before it started."""
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE job SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued' AND cancel_requested = 0",
+        (_now(), job_id),
+    )
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def report_progress(conn: sqlite3.Connection, job_id: int, progress: float, message: str | None) -> bool:
+    """Store progress of a running job. Returns True if cancellation was requested."""
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE job SET progress = ?, message = COALESCE(?, message) WHERE id = ?",
+        (min(max(progress, 0.0), 1.0), message, job_id),
+    )
+    conn.commit()
+    cur.execute("SELECT cancel_requested FROM job WHERE id = ?", (job_id,))
+    (cancel_requested,) = cur.fetchone()
+    return bool(cancel_requested)
+
+
+def finish_job(
+        conn: sqlite3.Connection,
+        job_id: int,
+        status: str,
+        result: Any = None,
+        error: str | None = None,
+) -> None:
+    """Store the outcome of a job: status 'done', 'failed' or 'cancelled'. Finished jobs are left alone."""
+    conn.execute(
+        """
+        UPDATE job
+        SET status = ?, result = ?, error = ?, finished_at = ?,
+            progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END
+        WHERE id = ? AND status IN ('queued', 'running')
+        """,
+        (status, None if result is None else json.dumps(result), error, _now(), status, job_id),
+    )
+    conn.commit()
+
+
+def request_cancel(conn: sqlite3.Connection, job_id: int) -> None:
+    """Ask a job to stop. Queued jobs are cancelled right away, running jobs at their next progress report."""
+    conn.execute("UPDATE job SET cancel_requested = 1 WHERE id = ? AND status IN ('queued', 'running')", (job_id,))
+    conn.execute(
+        "UPDATE job SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+        (_now(), job_id),
+    )
+    conn.commit()
+
+
+def fail_interrupted_jobs(conn: sqlite3.Connection) -> int:
+    """Mark jobs left in flight by a previous server process as failed. Returns how many there were."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        UPDATE job SET status = 'failed', error = 'Interrupted by a server restart.', finished_at = ?
+        WHERE status IN ('queued', 'running')
+        """,
+        (_now(),),
+    )
+    conn.commit()
+    return cur.rowcount
@@ -0,0 +1,135 @@
+from dataclasses import dataclass
+from datetime import datetime, UTC
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Any, Callable
+
+from . import DB_PATH, DB_PROFILE, connect, get_db_path, list_kingdoms, process_resource
+from .availability_log import compact_log
+
+
+@dataclass(frozen=True)
+class MaintenanceTask:
+    action: str | Callable[[sqlite3.Connection], Any]     # SQL to execute, or a function taking the connection
+    interval_seconds: float
+
+
+TASKS: dict[str, MaintenanceTask] = {
+    "checkpoint": MaintenanceTask("PRAGMA wal_checkpoint(TRUNCATE);", 10 * 60),
+    "optimize": MaintenanceTask("PRAGMA optimize;", 60 * 60),
+    "analyze": MaintenanceTask("ANALYZE;", 24 * 60 * 60),
+    "vacuum": MaintenanceTask("VACUUM;", 7 * 24 * 60 * 60),
+    "compact_availability_log": MaintenanceTask(lambda conn: compact_log(conn=conn), 24 * 60 * 60),
+}
+
+# VACUUM rewrites the whole file and blocks writers, only worth it when a lot of space is free
+VACUUM_MIN_FREE_FRACTION = 0.2
+CHECK_INTERVAL_SECONDS = 60
+
+
+def get_db_stats(conn: sqlite3.Connection, db_path: Path = DB_PATH) -> dict[str, Any]:
+    """Return page count, freelist and WAL size of the database."""
+    (page_count,) = conn.execute("PRAGMA page_count;").fetchone()
+    (page_size,) = conn.execute("PRAGMA page_size;").fetchone()
+    (freelist_count,) = conn.execute("PRAGMA freelist_count;").fetchone()
+    wal_path = db_path.with_name(db_path.name + "-wal")
+    return {
+        "page_count": page_count,
+        "page_size": page_size,
+        "freelist_count": freelist_count,
+        "db_size_bytes": page_count * page_size,
+        "wal_size_bytes": wal_path.stat().st_size if wal_path.exists() else 0,
+    }
+
+
+def run_maintenance_task(conn: sqlite3.Connection, name: str, db_path: Path) -> bool:
+    """Run one maintenance task on a database. Returns False if it was skipped as not worth it."""
+    task = TASKS[name]
+    if name == "vacuum":
+        stats = get_db_stats(conn, db_path)
+        if stats["freelist_count"] < VACUUM_MIN_FREE_FRACTION * stats["page_count"]:
+            return False
+    if callable(task.action):
+        task.action(conn)
+    else:
+        conn.execute(task.action)
+    conn.commit()
+    return True
+
+
+class MaintenanceScheduler:
+    """Runs the maintenance TASKS on every kingdom's database, on its own connections, when they are due."""
+
+    def __init__(self, check_interval: float = CHECK_INTERVAL_SECONDS) -> None:
+        self.check_interval = check_interval
+        self.last_run: dict[str, str | None] = {name: None for name in TASKS}
+
+        self._lock = threading.Lock()
+        self._conns: dict[str, sqlite3.Connection] = {}
+        self._errors: dict[str, str] = {}   # task name -> errors of its latest run
+        # When each task was last due and checked, whether or not it ran (VACUUM is often skipped)
+        self._last_check_monotonic: dict[str, float] = {}
+        # Don't hammer the database right after startup, the first round runs after check_interval
+        self._started = time.monotonic()
+
+        threading.Thread(target=self._run, name="db-maintenance", daemon=True).start()
+
+    def _conn(self, kingdom: str) -> sqlite3.Connection:
+        conn = self._conns.get(kingdom)
+        if conn is None:
+            conn = self._conns[kingdom] = connect(get_db_path(kingdom))
+        return conn
+
+    def run_task(self, name: str, kingdoms: list[str] | None = None) -> None:
+        """Run a single maintenance task now, on the given kingdoms or all of them."""
+        ran = False
+        errors = []
+        with self._lock:
+            for kingdom in kingdoms or list_kingdoms():
+                if not get_db_path(kingdom).exists():
+                    continue
+                try:
+                    ran |= run_maintenance_task(self._conn(kingdom), name, get_db_path(kingdom))
+                except sqlite3.Error as e:
+                    errors.append(f"{name} ({kingdom}): {e}")
+            self._last_check_monotonic[name] = time.monotonic()
+            if ran:
+                self.last_run[name] = datetime.now(UTC).isoformat(timespec="seconds")
+            if errors:
+                self._errors[name] = "; ".join(errors)
+            else:
+                self._errors.pop(name, None)
+
+    @property
+    def last_error(self) -> str | None:
+        return "; ".join(self._errors.values()) or None
+
+    def _due(self, name: str) -> bool:
+        last = self._last_check_monotonic.get(name, self._started)
+        return time.monotonic() - last >= TASKS[name].interval_seconds
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.check_interval)
+            for name in TASKS:
+                if self._due(name):
+                    self.run_task(name)
+
+    def status(self, kingdom: str) -> dict[str, Any]:
+        """Database statistics of a kingdom plus the last run time of every task."""
+        with self._lock:
+            stats = get_db_stats(self._conn(kingdom), get_db_path(kingdom))
+        return {
+            "profile": DB_PROFILE,
+            **stats,
+            "last_run": dict(self.last_run),
+            "last_error": self.last_error,
+        }
+
+
+@process_resource
+def start_maintenance_scheduler() -> MaintenanceScheduler:
+    """Start the process-wide maintenance scheduler."""
+    return MaintenanceScheduler()
@@ -0,0 +1,79 @@
+"""
+Memory accounting: deep object sizes, and the size of the process-wide resources
+(snapshots, indexes, in-memory repositories) that define memory_bytes().
+"""
+from collections import deque
+from dataclasses import dataclass
+import sys
+import types
+from typing import Any
+
+from . import PROCESS_RESOURCES
+
+_ATOMIC = (str, bytes, bytearray, int, float, complex, bool, type(None))
+# Counted, but not followed: their contents belong to the program, not to the object
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def _pandas_bytes(obj: Any) -> int | None:
+    """memory_usage of pandas objects, None for anything else. Never imports pandas itself."""
+    pd = sys.modules.get("pandas")
+    if pd is None or not isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        return None
+    usage = obj.memory_usage(deep=True)
+    return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+
+
+def deep_sizeof(obj: Any) -> int:
+    """
+    Approximate bytes held by obj: sys.getsizeof of obj and everything reachable through containers,
+    instance __dict__ and __slots__, counting shared objects once. DataFrames report their memory_usage.
+    """
+    seen: set[int] = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+
+        pandas_bytes = _pandas_bytes(obj)
+        if pandas_bytes is not None:
+            total += pandas_bytes
+            continue
+        total += sys.getsizeof(obj)
+        if isinstance(obj, _ATOMIC + _OPAQUE):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            stack.extend(obj)
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for cls in type(obj).__mro__:
+                slots = cls.__dict__.get("__slots__", ())
+                for name in (slots,) if isinstance(slots, str) else slots:
+                    if hasattr(obj, name):
+                        stack.append(getattr(obj, name))
+    return total
+
+
+@dataclass(frozen=True)
+class ResourceMemory:
+    resource: str       # function that created it
+    args: tuple
+    bytes: int
+
+
+def resource_memory() -> list[ResourceMemory]:
+    """Size of every cached process resource that reports its memory, largest first."""
+    sizes = [
+        ResourceMemory(name, args, value.memory_bytes())
+        for name, cache in list(PROCESS_RESOURCES.items())
+        for args, value in list(cache.items())
+        if hasattr(value, "memory_bytes")
+    ]
+    return sorted(sizes, key=lambda r: r.bytes, reverse=True)
@@ -0,0 +1,151 @@
+"""
+Availability questions across activities and players: who is free for two activities at the same time,
+who double-booked activities on the same day, and when enough members of an alliance are available.
+
+Everything is answered from an in-memory index of the active activities, built from the reporting
+snapshot with one scan. Availability is held as bitsets, a slot mask per (activity, player) and a
+player mask per (activity, slot) with bit n set for player_id n, so every question is a handful of
+integer ANDs and popcounts instead of a query per player or activity.
+"""
+from dataclasses import dataclass
+from itertools import combinations
+import sqlite3
+import threading
+from typing import Iterable
+
+from . import current_kingdom, process_resource
+from .availability import ALL_SLOTS, SLOT_INDEX, mask_to_slots
+from .memory import deep_sizeof
+from .records import iter_rows
+from .snapshot import get_snapshot
+
+
+@dataclass(frozen=True)
+class DoubleBooking:
+    player_id: int
+    activity_ids: tuple[int, int]
+    event_date: str
+    slots: list[str]
+
+
+class AvailabilityIndex:
+    """Bitset index of the availability of all active activities."""
+
+    def __init__(
+            self,
+            activities: Iterable[tuple[int, str, str | None]],
+            players: Iterable[tuple[int, str, str | None]],
+            availability: Iterable[tuple[int, int, str]],
+    ) -> None:
+        self.activities = {activity_id: (name, event_date) for activity_id, name, event_date in activities}
+        self.player_names: dict[int, str] = {}
+        self._alliance_players: dict[str, int] = {}
+        for player_id, game_username, alliance in players:
+            self.player_names[player_id] = game_username
+            if alliance:
+                self._alliance_players[alliance] = self._alliance_players.get(alliance, 0) | 1 << player_id
+
+        self._slot_masks: dict[int, dict[int, int]] = {activity_id: {} for activity_id in self.activities}
+        self._slot_players: dict[int, list[int]] = {activity_id: [0] * len(ALL_SLOTS) for activity_id in self.activities}
+        for player_id, activity_id, slot in availability:
+            i = SLOT_INDEX.get(slot)
+            if i is None or activity_id not in self.activities:
+                continue
+            masks = self._slot_masks[activity_id]
+            masks[player_id] = masks.get(player_id, 0) | 1 << i
+            self._slot_players[activity_id][i] |= 1 << player_id
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection) -> "AvailabilityIndex":
+        cur = conn.cursor()
+        cur.execute("SELECT id, name, event_date FROM activity WHERE is_active = 1")
+        activities = cur.fetchall()
+        cur.execute("SELECT player_id, game_username, alliance FROM player")
+        players = cur.fetchall()
+        cur.execute(
+            """
+            SELECT av.player_id, av.activity_id, av.slot
+            FROM effective_availability av
+            JOIN activity a ON a.id = av.activity_id
+            WHERE a.is_active = 1
+            """
+        )
+        return cls(activities, players, iter_rows(cur))
+
+    @property
+    def alliances(self) -> list[str]:
+        return sorted(self._alliance_players)
+
+    def slots_of(self, player_id: int, activity_id: int) -> list[str]:
+        return mask_to_slots(self._slot_masks[activity_id].get(player_id, 0))
+
+    def free_for_both(self, activity_a: int, activity_b: int) -> dict[int, list[str]]:
+        """Players available for both activities at the same time, with the slots they share."""
+        masks_a, masks_b = self._slot_masks[activity_a], self._slot_masks[activity_b]
+        if len(masks_b) < len(masks_a):
+            masks_a, masks_b = masks_b, masks_a
+        shared = {}
+        for player_id, mask_a in masks_a.items():
+            common = mask_a & masks_b.get(player_id, 0)
+            if common:
+                shared[player_id] = mask_to_slots(common)
+        return shared
+
+    def double_bookings(self) -> list[DoubleBooking]:
+        """Players available at the same time for two activities on the same date."""
+        by_date: dict[str, list[int]] = {}
+        for activity_id, (_, event_date) in self.activities.items():
+            if event_date:
+                by_date.setdefault(event_date, []).append(activity_id)
+
+        bookings = []
+        for event_date, activity_ids in sorted(by_date.items()):
+            for a, b in combinations(sorted(activity_ids), 2):
+                # Cheap pre-check: skip the pair unless some slot has a player in both
+                if not any(pa & pb for pa, pb in zip(self._slot_players[a], self._slot_players[b])):
+                    continue
+                for player_id, slots in sorted(self.free_for_both(a, b).items()):
+                    bookings.append(DoubleBooking(player_id, (a, b), event_date, slots))
+        return bookings
+
+    def alliance_slots(self, activity_id: int, alliance: str, min_members: int = 1) -> list[tuple[str, int]]:
+        """(slot, members available) for every slot with at least min_members of the alliance available."""
+        members = self._alliance_players.get(alliance, 0)
+        counts = ((slot, (players & members).bit_count()) for slot, players in zip(ALL_SLOTS, self._slot_players[activity_id]))
+        return [(slot, count) for slot, count in counts if count >= min_members and count > 0]
+
+
+class _IndexCache:
+    """The index of one kingdom, rebuilt when the reporting snapshot it was built from is replaced."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._built_from: tuple[float, int] | None = None
+        self._index: AvailabilityIndex | None = None
+
+    def get(self, kingdom: str) -> AvailabilityIndex:
+        snapshot = get_snapshot(kingdom)
+        key = (snapshot.taken_at, snapshot.data_version)
+        with self._lock:
+            if self._index is None or self._built_from != key:
+                self._index = AvailabilityIndex.from_connection(snapshot.conn)
+                self._built_from = key
+            return self._index
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return deep_sizeof(self._index) if self._index is not None else 0
+
+
+@process_resource
+def _get_index_cache(kingdom: str) -> _IndexCache:
+    return _IndexCache()
+
+
+def get_availability_index(kingdom: str | None = None) -> AvailabilityIndex:
+    """
+    Return the availability index of a kingdom, by default the current session's kingdom.
+    Like the snapshot it is built from, it can lag the live database by a few seconds.
+    """
+    kingdom = kingdom or current_kingdom()
+    return _get_index_cache(kingdom).get(kingdom)
@@ -1,7 +1,17 @@
 from datetime import datetime, UTC
-from typing import Optional, Any
-import pandas as pd
+from typing import Optional, Any, TYPE_CHECKING
+
 from . import get_connection
+from .records import PlayerRecord
+
+if TYPE_CHECKING:
+    import pandas as pd     # only the admin pages pass DataFrames, don't pay for the import elsewhere
+
+# Fixed query texts, so every lookup hits the connection's prepared statement cache
+SELECT_PLAYER_BY = {
+    column: f"SELECT {', '.join(PlayerRecord.__slots__)} FROM player WHERE {column} = ?"
+    for column in ("player_id", "game_username", "user_game_id", "app_username")
+}
 
 
 def any_admin_exists() -> bool:
@@ -58,55 +68,30 @@ def set_player_pin_hash(player_id: int, pin_hash: str) -> None:
     conn.commit()
 
 
-def get_player_by(column: str, value: Any) -> Optional[dict[str, Any]]:
+def get_player_by(column: str, value: Any) -> Optional[PlayerRecord]:
     """
     Player lookup by a given column.
     column: the column to filter on (e.g. 'game_username', 'user_game_id', 'app_username')
     value: the value to match in that column.
     """
-    # whitelist column:
-    allowed = {
-        "player_id",
-        "game_username",
-        "user_game_id",
-        "app_username",
-    }
-
-    if column not in allowed:
+    # whitelisted columns only, each with its own fixed query text
+    query = SELECT_PLAYER_BY.get(column)
+    if query is None:
         raise ValueError(f"Invalid lookup column: {column}")
 
     conn = get_connection()
     cur = conn.cursor()
-
-    # Build the query dynamically but safely
-    query = f"""
-        SELECT player_id, user_game_id, game_username, app_username, pin_hash, alliance, is_admin, is_super_admin, created_at
-        FROM player
-        WHERE {column} = ?
-    """
-
+    cur.row_factory = PlayerRecord.from_row
     cur.execute(query, (value,))
-    row = cur.fetchone()
-    if row is None:
-        return None
-
-    return {
-        "player_id": row[0],
-        "user_game_id": row[1],
-        "game_username": row[2],
-        "app_username": row[3],
-        "pin_hash": row[4],
-        "alliance": row[5],
-        "is_admin": int(row[6]),
-        "is_super_admin": int(row[7]),
-        "created_at": row[8],
-    }
-
-def update_players_from_df(changed: pd.DataFrame) -> int:
+    return cur.fetchone()
+
+def update_players_from_df(changed: "pd.DataFrame") -> int:
     """
     Applies updates to the database for the given rows, indexed by player_id.
     Returns the number of rows updated.
     """
+    import pandas as pd
+
     if changed.empty:
         return 0
 
@@ -135,6 +120,7 @@ def update_players_from_df(changed: pd.DataFrame) -> int:
         )
 
     conn.commit()
+    return len(changed)
 
 
 def update_player_profile(
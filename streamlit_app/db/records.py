@@ -0,0 +1,110 @@
+"""
+Compact row objects for query results.
+
+Records use __slots__, so they are much smaller than the dicts they replace, and support
+the same read access (record["name"], record.get("name")) so callers don't care which one they get.
+Create them straight from the cursor with `cur.row_factory = PlayerRecord.from_row`.
+"""
+import sqlite3
+from typing import Any, Iterator
+
+
+class Record:
+    __slots__ = ()
+
+    def __init__(self, *values: Any) -> None:
+        for field, value in zip(self.__slots__, values, strict=True):
+            setattr(self, field, value)
+
+    @classmethod
+    def from_row(cls, cursor: sqlite3.Cursor, row: tuple) -> "Record":
+        """row_factory for queries selecting exactly the record's fields, in order."""
+        return cls(*row)
+
+    @classmethod
+    def from_dict(cls, values: dict[str, Any]) -> "Record":
+        return cls(*(values[field] for field in cls.__slots__))
+
+    def __getitem__(self, field: str) -> Any:
+        if field not in self.__slots__:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __contains__(self, field: object) -> bool:
+        return field in self.__slots__
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def get(self, field: str, default: Any = None) -> Any:
+        return getattr(self, field, default) if field in self.__slots__ else default
+
+    def keys(self) -> tuple[str, ...]:
+        return self.__slots__
+
+    def as_dict(self) -> dict[str, Any]:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    # Records are never modified after creation, so hashing by value is safe
+    def __hash__(self) -> int:
+        return hash((type(self), *(getattr(self, f) for f in self.__slots__)))
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{f}={getattr(self, f)!r}" for f in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+class PlayerRecord(Record):
+    __slots__ = ("player_id", "user_game_id", "game_username", "app_username", "pin_hash", "alliance",
+                 "is_admin", "is_super_admin", "created_at")
+
+    @classmethod
+    def from_row(cls, cursor: sqlite3.Cursor, row: tuple) -> "PlayerRecord":
+        record = cls(*row)
+        # Flags are always ints, whatever was stored (booleans, "1" from a CSV import, ...)
+        record.is_admin = int(record.is_admin)
+        record.is_super_admin = int(record.is_super_admin)
+        return record
+
+
+class ActivityRecord(Record):
+    __slots__ = ("id", "name", "description", "event_date", "is_active", "created_at")
+
+
+class AvailabilityRecord(Record):
+    __slots__ = ("player_id", "activity_id", "slot")
+
+
+class AvailabilityChangeRecord(Record):
+    __slots__ = ("id", "player_id", "activity_id", "slot", "op", "changed_at")
+
+
+class TemplateRecord(Record):
+    __slots__ = ("id", "player_id", "name", "slot_mask", "created_at", "updated_at")
+
+    @property
+    def slots(self) -> list[str]:
+        from .availability import mask_to_slots
+        return mask_to_slots(self.slot_mask)
+
+
+class JobRecord(Record):
+    __slots__ = ("id", "name", "params", "status", "progress", "message", "result", "error",
+                 "cancel_requested", "created_by", "created_at", "started_at", "finished_at")
+
+
+FETCH_SIZE = 500
+
+
+def iter_rows(cur: sqlite3.Cursor, size: int = FETCH_SIZE) -> Iterator[Any]:
+    """Iterate over the results of an executed cursor, fetching `size` rows at a time."""
+    while True:
+        rows = cur.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
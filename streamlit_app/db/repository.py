@@ -0,0 +1,467 @@
+"""
+Storage interface used by the pages: players, activities and availability.
+
+SqliteRepository is the real thing, MemoryRepository keeps everything in dicts so tests
+and load simulations can run without disk I/O or a Streamlit runtime.
+Select the backend with KINGDOM_DB_BACKEND ("sqlite" or "memory").
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime, UTC
+import os
+import sqlite3
+import threading
+from typing import Any, Optional, TYPE_CHECKING
+
+from . import current_kingdom, init_db, process_resource
+from . import activity as activity_db
+from . import availability as availability_db
+from . import export as export_db
+from . import player as player_db
+from . import templates as templates_db
+from .availability import mask_to_slots, slots_to_mask
+from .memory import deep_sizeof
+from .records import ActivityRecord, PlayerRecord, TemplateRecord
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DB_BACKEND = os.environ.get("KINGDOM_DB_BACKEND", "sqlite")
+
+
+class Repository(ABC):
+    """Everything the pages read from and write to storage."""
+
+    @abstractmethod
+    def init(self) -> None:
+        """Prepare the storage for use, called at the start of every page run."""
+
+    # Players
+
+    @abstractmethod
+    def any_admin_exists(self) -> bool: ...
+
+    @abstractmethod
+    def create_player(
+            self,
+            user_game_id: int,
+            game_username: str,
+            app_username: str | None,
+            pin_hash: str | None,
+            is_admin: bool = False,
+            is_super_admin: bool = False,
+    ) -> int:
+        """Create player and return new player_id. Raises sqlite3.IntegrityError on duplicates."""
+
+    @abstractmethod
+    def get_player_by(self, column: str, value: Any) -> Optional[PlayerRecord]: ...
+
+    @abstractmethod
+    def set_player_pin_hash(self, player_id: int, pin_hash: str) -> None: ...
+
+    @abstractmethod
+    def update_player_profile(
+            self,
+            player_id: int,
+            user_game_id: int,
+            game_username: str,
+            app_username: str,
+            alliance: str | None,
+    ) -> None: ...
+
+    @abstractmethod
+    def update_players_from_df(self, changed: "pd.DataFrame") -> int:
+        """Apply edited rows, indexed by player_id. Returns the number of rows updated."""
+
+    # Activities
+
+    @abstractmethod
+    def get_active_activities(self) -> list[tuple[int, str, str | None]]: ...
+
+    @abstractmethod
+    def get_all_activities(self) -> list[ActivityRecord]: ...
+
+    @abstractmethod
+    def create_activity(
+            self,
+            name: str,
+            description: str | None,
+            event_date: str | None,
+            is_active: bool = True,
+    ) -> None: ...
+
+    # Availability
+
+    @abstractmethod
+    def save_availability(self, player_id: int, activity_id: int, slots: list[str]) -> None: ...
+
+    @abstractmethod
+    def get_availability_slots(self, player_id: int, activity_id: int) -> list[str]: ...
+
+    # Availability templates
+
+    @abstractmethod
+    def get_templates(self, player_id: int) -> list[TemplateRecord]: ...
+
+    @abstractmethod
+    def get_applied_template_id(self, player_id: int, activity_id: int) -> int | None: ...
+
+    @abstractmethod
+    def save_template(self, player_id: int, name: str, slots: list[str]) -> int:
+        """Create or replace the player's template with this name and return its id."""
+
+    @abstractmethod
+    def apply_template(self, player_id: int, activity_id: int, template_id: int) -> None:
+        """Replace the player's availability for the activity with the template."""
+
+    @abstractmethod
+    def delete_template(self, player_id: int, template_id: int) -> None:
+        """Delete a template, activities it was applied to keep their availability."""
+
+    # Exports
+
+    @abstractmethod
+    def get_table_df(self, table_name: str, snapshot: bool = False) -> "pd.DataFrame": ...
+
+
+class SqliteRepository(Repository):
+    """Repository backed by the SQLite database of the current kingdom."""
+
+    def init(self) -> None:
+        init_db()
+
+    def any_admin_exists(self) -> bool:
+        return player_db.any_admin_exists()
+
+    def create_player(self, user_game_id, game_username, app_username, pin_hash, is_admin=False, is_super_admin=False):
+        return player_db.create_player(user_game_id, game_username, app_username, pin_hash, is_admin, is_super_admin)
+
+    def get_player_by(self, column, value):
+        return player_db.get_player_by(column, value)
+
+    def set_player_pin_hash(self, player_id, pin_hash):
+        player_db.set_player_pin_hash(player_id, pin_hash)
+
+    def update_player_profile(self, player_id, user_game_id, game_username, app_username, alliance):
+        player_db.update_player_profile(player_id, user_game_id, game_username, app_username, alliance)
+
+    def update_players_from_df(self, changed):
+        return player_db.update_players_from_df(changed)
+
+    def get_active_activities(self):
+        return activity_db.get_active_activities()
+
+    def get_all_activities(self):
+        return activity_db.get_all_activities()
+
+    def create_activity(self, name, description, event_date, is_active=True):
+        activity_db.create_activity(name, description, event_date, is_active)
+
+    def save_availability(self, player_id, activity_id, slots):
+        availability_db.save_availability(player_id, activity_id, slots)
+
+    def get_availability_slots(self, player_id, activity_id):
+        return availability_db.get_availability_slots(player_id, activity_id)
+
+    def get_templates(self, player_id):
+        return templates_db.get_templates(player_id)
+
+    def get_applied_template_id(self, player_id, activity_id):
+        return templates_db.get_applied_template_id(player_id, activity_id)
+
+    def save_template(self, player_id, name, slots):
+        return templates_db.save_template(player_id, name, slots)
+
+    def apply_template(self, player_id, activity_id, template_id):
+        templates_db.apply_template(player_id, activity_id, template_id)
+
+    def delete_template(self, player_id, template_id):
+        templates_db.delete_template(player_id, template_id)
+
+    def get_table_df(self, table_name, snapshot=False):
+        return export_db.get_table_df(table_name, snapshot=snapshot)
+
+
+class MemoryRepository(Repository):
+    """
+    Repository keeping all data in dicts, with the same constraints as schema.sql.
+    Availability is indexed per (player_id, activity_id), lookups by the unique player columns are O(1).
+    """
+
+    TABLE_COLUMNS = {
+        "player": ["player_id", "user_game_id", "game_username", "app_username", "pin_hash", "alliance",
+                   "is_admin", "is_super_admin", "created_at"],
+        "activity": ["id", "name", "description", "event_date", "is_active", "created_at"],
+        "availability": ["player_id", "activity_id", "slot", "created_at"],
+    }
+    _LOOKUP_COLUMNS = ("player_id", "game_username", "user_game_id", "app_username")
+    _UNIQUE_COLUMNS = ("user_game_id", "game_username")
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._players: dict[int, dict[str, Any]] = {}
+        self._player_index: dict[str, dict[Any, int]] = {column: {} for column in self._LOOKUP_COLUMNS[1:]}
+        self._activities: dict[int, dict[str, Any]] = {}
+        self._availability: dict[tuple[int, int], tuple[list[str], str]] = {}     # -> (sorted slots, created_at)
+        self._templates: dict[int, dict[str, Any]] = {}
+        # (player_id, activity_id) -> (template_id, added_mask, removed_mask, created_at), instead of _availability
+        self._template_uses: dict[tuple[int, int], tuple[int, int, int, str]] = {}
+        self._next_player_id = 1
+        self._next_activity_id = 1
+        self._next_template_id = 1
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(UTC).isoformat(timespec="seconds")
+
+    def init(self) -> None:
+        pass
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return deep_sizeof([self._players, self._player_index, self._activities, self._availability,
+                                self._templates, self._template_uses])
+
+    # Players
+
+    def _index_player(self, player: dict[str, Any]) -> None:
+        for column, index in self._player_index.items():
+            if player[column] is not None:
+                index.setdefault(player[column], player["player_id"])
+
+    def _unindex_player(self, player: dict[str, Any]) -> None:
+        for column, index in self._player_index.items():
+            if index.get(player[column]) == player["player_id"]:
+                del index[player[column]]
+
+    def _check_unique(self, player: dict[str, Any]) -> None:
+        for column in self._UNIQUE_COLUMNS:
+            other = self._player_index[column].get(player[column])
+            if other is not None and other != player["player_id"]:
+                raise sqlite3.IntegrityError(f"UNIQUE constraint failed: player.{column}")
+
+    def _update_player(self, player_id: int, **values: Any) -> None:
+        with self._lock:
+            player = self._players.get(player_id)
+            if player is None:
+                return
+            updated = {**player, **values}
+            self._check_unique(updated)
+            self._unindex_player(player)
+            self._players[player_id] = updated
+            self._index_player(updated)
+
+    def any_admin_exists(self) -> bool:
+        with self._lock:
+            return any(player["is_admin"] for player in self._players.values())
+
+    def create_player(self, user_game_id, game_username, app_username, pin_hash, is_admin=False, is_super_admin=False):
+        with self._lock:
+            player = {
+                "player_id": self._next_player_id,
+                "user_game_id": user_game_id,
+                "game_username": game_username,
+                "app_username": app_username,
+                "pin_hash": pin_hash,
+                "alliance": None,
+                "is_admin": int(is_admin),
+                "is_super_admin": int(is_super_admin),
+                "created_at": self._now(),
+            }
+            self._check_unique(player)
+            self._players[player["player_id"]] = player
+            self._index_player(player)
+            self._next_player_id += 1
+            return player["player_id"]
+
+    def get_player_by(self, column, value):
+        if column not in self._LOOKUP_COLUMNS:
+            raise ValueError(f"Invalid lookup column: {column}")
+        with self._lock:
+            player_id = value if column == "player_id" else self._player_index[column].get(value)
+            player = self._players.get(player_id)
+            return PlayerRecord.from_dict(player) if player else None
+
+    def set_player_pin_hash(self, player_id, pin_hash):
+        self._update_player(player_id, pin_hash=pin_hash)
+
+    def update_player_profile(self, player_id, user_game_id, game_username, app_username, alliance):
+        self._update_player(
+            player_id,
+            user_game_id=user_game_id,
+            game_username=game_username,
+            app_username=app_username,
+            alliance=alliance,
+        )
+
+    def update_players_from_df(self, changed):
+        import pandas as pd
+
+        with self._lock:
+            for player_id, row in changed.iterrows():
+                self._update_player(
+                    int(player_id),
+                    user_game_id=int(row["user_game_id"]) if pd.notna(row["user_game_id"]) else None,
+                    game_username=row["game_username"],
+                    app_username=row.get("app_username"),
+                    alliance=row.get("alliance"),
+                    is_admin=int(bool(row["is_admin"])),
+                    is_super_admin=int(bool(row["is_super_admin"])),
+                )
+        return len(changed)
+
+    # Activities
+
+    def get_active_activities(self):
+        with self._lock:
+            active = [a for a in self._activities.values() if a["is_active"]]
+        active.sort(key=lambda a: (a["event_date"] is not None, a["event_date"] or ""))     # NULLs first, like SQLite
+        return [(a["id"], a["name"], a["event_date"]) for a in active]
+
+    def get_all_activities(self):
+        with self._lock:
+            activities = [ActivityRecord.from_dict(a) for a in self._activities.values()]
+        activities.sort(key=lambda a: a.created_at, reverse=True)
+        return activities
+
+    def create_activity(self, name, description, event_date, is_active=True):
+        with self._lock:
+            activity_id = self._next_activity_id
+            self._activities[activity_id] = {
+                "id": activity_id,
+                "name": name,
+                "description": description,
+                "event_date": event_date,
+                "is_active": int(is_active),
+                "created_at": self._now(),
+            }
+            self._next_activity_id += 1
+
+    # Availability
+
+    def _effective_slots(self, key: tuple[int, int]) -> tuple[list[str], str | None]:
+        if key in self._template_uses:
+            template_id, added_mask, removed_mask, created_at = self._template_uses[key]
+            template_mask = self._templates[template_id]["slot_mask"]
+            return mask_to_slots((template_mask | added_mask) & ~removed_mask), created_at
+        return self._availability.get(key, ([], None))
+
+    def save_availability(self, player_id, activity_id, slots):
+        if player_id not in self._players or activity_id not in self._activities:
+            raise sqlite3.IntegrityError("FOREIGN KEY constraint failed")
+        key = (player_id, activity_id)
+        with self._lock:
+            if key in self._template_uses:
+                template_id, _, _, created_at = self._template_uses[key]
+                template_mask = self._templates[template_id]["slot_mask"]
+                new_mask = slots_to_mask(slots)
+                self._template_uses[key] = (template_id, new_mask & ~template_mask, template_mask & ~new_mask, created_at)
+            elif slots:
+                self._availability[key] = (sorted(set(slots)), self._now())
+            else:
+                self._availability.pop(key, None)
+
+    def get_availability_slots(self, player_id, activity_id):
+        with self._lock:
+            slots, _ = self._effective_slots((player_id, activity_id))
+        return list(slots)
+
+    # Availability templates
+
+    def get_templates(self, player_id):
+        with self._lock:
+            templates = [TemplateRecord.from_dict(t) for t in self._templates.values() if t["player_id"] == player_id]
+        templates.sort(key=lambda t: t.name)
+        return templates
+
+    def get_applied_template_id(self, player_id, activity_id):
+        with self._lock:
+            use = self._template_uses.get((player_id, activity_id))
+        return use[0] if use else None
+
+    def save_template(self, player_id, name, slots):
+        if player_id not in self._players:
+            raise sqlite3.IntegrityError("FOREIGN KEY constraint failed")
+        mask = slots_to_mask(slots)
+        with self._lock:
+            for template in self._templates.values():
+                if template["player_id"] == player_id and template["name"] == name:
+                    template.update(slot_mask=mask, updated_at=self._now())
+                    return template["id"]
+            template_id = self._next_template_id
+            self._templates[template_id] = {
+                "id": template_id,
+                "player_id": player_id,
+                "name": name,
+                "slot_mask": mask,
+                "created_at": self._now(),
+                "updated_at": self._now(),
+            }
+            self._next_template_id += 1
+            return template_id
+
+    def _own_template(self, player_id: int, template_id: int) -> dict[str, Any]:
+        template = self._templates.get(template_id)
+        if template is None or template["player_id"] != player_id:
+            raise ValueError(f"Template {template_id} doesn't belong to player {player_id}")
+        return template
+
+    def apply_template(self, player_id, activity_id, template_id):
+        if activity_id not in self._activities:
+            raise sqlite3.IntegrityError("FOREIGN KEY constraint failed")
+        with self._lock:
+            self._own_template(player_id, template_id)
+            self._availability.pop((player_id, activity_id), None)
+            self._template_uses[(player_id, activity_id)] = (template_id, 0, 0, self._now())
+
+    def delete_template(self, player_id, template_id):
+        with self._lock:
+            self._own_template(player_id, template_id)
+            for key, use in list(self._template_uses.items()):
+                if use[0] == template_id:
+                    slots, created_at = self._effective_slots(key)
+                    del self._template_uses[key]
+                    if slots:
+                        self._availability[key] = (slots, created_at)
+            del self._templates[template_id]
+
+    # Exports
+
+    def _table_rows(self, table_name: str) -> list[dict[str, Any]]:
+        with self._lock:
+            if table_name == "player":
+                return [dict(p) for p in self._players.values()]
+            if table_name == "activity":
+                return [dict(a) for a in self._activities.values()]
+            rows = []
+            for player_id, activity_id in [*self._availability, *self._template_uses]:
+                slots, created_at = self._effective_slots((player_id, activity_id))
+                for slot in slots:
+                    rows.append({
+                        "player_id": player_id,
+                        "activity_id": activity_id,
+                        "slot": slot,
+                        "created_at": created_at,
+                    })
+            return rows
+
+    def get_table_df(self, table_name, snapshot=False):
+        import pandas as pd
+
+        if table_name not in self.TABLE_COLUMNS:
+            raise ValueError(f"Unknown table: {table_name}")
+        return pd.DataFrame(self._table_rows(table_name), columns=self.TABLE_COLUMNS[table_name])
+
+
+@process_resource
+def _get_memory_repository(kingdom: str) -> MemoryRepository:
+    return MemoryRepository()
+
+
+def get_repository(backend: str | None = None) -> Repository:
+    """Return the storage for the current kingdom, using the configured backend by default."""
+    backend = backend or DB_BACKEND
+    if backend == "sqlite":
+        return SqliteRepository()
+    if backend == "memory":
+        return _get_memory_repository(current_kingdom())
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,169 @@
+"""
+Bulk roster import: create or update players from a CSV with columns user_game_id, game_username
+and alliance (optional). Rows are streamed in chunks and upserted on user_game_id, all in one transaction.
+"""
+import csv
+from dataclasses import dataclass, field
+from datetime import datetime, UTC
+import sqlite3
+from typing import Iterable, Iterator, TextIO
+
+from . import connect, current_kingdom, get_db_path
+
+CHUNK_SIZE = 1000
+
+# Accepted header names per column, compared case-insensitively
+COLUMN_ALIASES = {
+    "user_game_id": {"user_game_id", "in_game_id", "in-game id", "game_id", "id"},
+    "game_username": {"game_username", "in-game username", "username", "name"},
+    "alliance": {"alliance"},
+}
+
+
+@dataclass
+class RosterImportResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    conflicts: list[tuple[int, str]] = field(default_factory=list)   # (CSV line number, reason)
+    dry_run: bool = False
+
+
+@dataclass(frozen=True)
+class _RosterRow:
+    line: int
+    user_game_id: int
+    game_username: str
+    alliance: str | None
+
+
+def _column_map(header: Iterable[str]) -> dict[str, str]:
+    """Map our column names to the CSV's header names."""
+    mapping = {}
+    for name in header:
+        for column, aliases in COLUMN_ALIASES.items():
+            if name.strip().lower() in aliases and column not in mapping:
+                mapping[column] = name
+    missing = {"user_game_id", "game_username"} - mapping.keys()
+    if missing:
+        raise ValueError(f"Roster CSV is missing column(s): {', '.join(sorted(missing))}")
+    return mapping
+
+
+def _chunks(reader: csv.DictReader, columns: dict[str, str], result: RosterImportResult,
+            chunk_size: int) -> Iterator[list[_RosterRow]]:
+    chunk: list[_RosterRow] = []
+    for record in reader:
+        line = reader.line_num
+        user_game_id_str = (record.get(columns["user_game_id"]) or "").strip()
+        game_username = (record.get(columns["game_username"]) or "").strip()
+        alliance = (record.get(columns["alliance"]) or "").strip() if "alliance" in columns else ""
+
+        if not user_game_id_str and not game_username:
+            continue    # blank line
+        try:
+            user_game_id = int(user_game_id_str)
+        except ValueError:
+            result.conflicts.append((line, f"In-game ID '{user_game_id_str}' is not a number."))
+            continue
+        if not game_username:
+            result.conflicts.append((line, "In-game username is empty."))
+            continue
+
+        chunk.append(_RosterRow(line, user_game_id, game_username, alliance or None))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _import_chunk(cur: sqlite3.Cursor, chunk: list[_RosterRow], result: RosterImportResult,
+                  seen_ids: set[int], seen_names: set[str], now: str) -> None:
+    placeholders = ", ".join("?" * len(chunk))
+    cur.execute(
+        f"SELECT user_game_id, game_username, alliance FROM player WHERE user_game_id IN ({placeholders})",
+        [row.user_game_id for row in chunk],
+    )
+    by_id = {user_game_id: (name, alliance) for user_game_id, name, alliance in cur.fetchall()}
+    cur.execute(
+        f"SELECT game_username, user_game_id FROM player WHERE game_username IN ({placeholders})",
+        [row.game_username for row in chunk],
+    )
+    id_by_name = dict(cur.fetchall())
+
+    upserts = []
+    for row in chunk:
+        if row.user_game_id in seen_ids:
+            result.conflicts.append((row.line, f"In-game ID {row.user_game_id} appears more than once."))
+            continue
+        if row.game_username in seen_names:
+            result.conflicts.append((row.line, f"Username '{row.game_username}' appears more than once."))
+            continue
+        seen_ids.add(row.user_game_id)
+        seen_names.add(row.game_username)
+
+        owner = id_by_name.get(row.game_username)
+        if owner is not None and owner != row.user_game_id:
+            result.conflicts.append((row.line, f"Username '{row.game_username}' belongs to in-game ID {owner}."))
+            continue
+
+        existing = by_id.get(row.user_game_id)
+        if existing is None:
+            result.inserted += 1
+        elif existing == (row.game_username, row.alliance or existing[1]):
+            result.unchanged += 1
+            continue
+        else:
+            result.updated += 1
+        upserts.append((row.user_game_id, row.game_username, row.alliance, now))
+
+    if upserts:
+        cur.executemany(
+            """
+            INSERT INTO player (user_game_id, game_username, alliance, created_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_game_id) DO UPDATE SET
+                game_username = excluded.game_username,
+                alliance = COALESCE(excluded.alliance, player.alliance)
+            """,
+            upserts,
+        )
+
+
+def import_roster(
+        file: TextIO,
+        dry_run: bool = False,
+        chunk_size: int = CHUNK_SIZE,
+        kingdom: str | None = None,
+) -> RosterImportResult:
+    """
+    Create or update players from a roster CSV. A blank alliance keeps the player's current alliance.
+    Rows that can't be imported are reported as conflicts and skipped. With dry_run nothing is saved.
+    """
+    reader = csv.DictReader(file)
+    columns = _column_map(reader.fieldnames or [])
+    result = RosterImportResult(dry_run=dry_run)
+    now = datetime.now(UTC).isoformat(timespec="seconds")
+
+    # Own connection: the transaction must not be committed halfway by other sessions' writes
+    conn = connect(get_db_path(kingdom or current_kingdom()))
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        cur = conn.cursor()
+        seen_ids: set[int] = set()
+        seen_names: set[str] = set()
+        for chunk in _chunks(reader, columns, result, chunk_size):
+            _import_chunk(cur, chunk, result, seen_ids, seen_names, now)
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    result.conflicts.sort()
+    return result
@@ -32,3 +32,98 @@ CREATE TABLE IF NOT EXISTS availability (
     FOREIGN KEY (player_id) REFERENCES player(player_id),
     FOREIGN KEY (activity_id) REFERENCES activity(id)
 );
+
+-- Append-only history of availability changes, the id doubles as the sync watermark
+CREATE TABLE IF NOT EXISTS availability_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    player_id INT NOT NULL,
+    activity_id INT NOT NULL,
+    slot TEXT NOT NULL,         -- "HH:MM"
+    op TEXT NOT NULL CHECK (op IN ('+', '-')),  -- slot added or removed
+    changed_at TEXT NOT NULL    -- "YYYY-MM-DDTHH:MM:SS+00:00"
+);
+
+-- Availability as of the last compaction, old log entries are folded into this
+CREATE TABLE IF NOT EXISTS availability_log_base (
+    player_id INT NOT NULL,
+    activity_id INT NOT NULL,
+    slot TEXT NOT NULL,
+    PRIMARY KEY (player_id, activity_id, slot)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS availability_log_compaction (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    watermark INTEGER NOT NULL,     -- highest log id folded into availability_log_base
+    compacted_until TEXT NOT NULL   -- history before this moment is no longer available
+);
+
+-- Availability saved before the log existed becomes the starting state
+INSERT OR IGNORE INTO availability_log_base (player_id, activity_id, slot)
+SELECT player_id, activity_id, slot FROM availability
+WHERE NOT EXISTS (SELECT 1 FROM availability_log_compaction);
+
+INSERT OR IGNORE INTO availability_log_compaction (id, watermark, compacted_until)
+VALUES (1, 0, strftime('%Y-%m-%dT%H:%M:%S+00:00', 'now'));
+
+-- Background jobs started from the admin page, see streamlit_app/utils/job_runner.py
+CREATE TABLE IF NOT EXISTS job (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    params TEXT NOT NULL,       -- JSON, keys sorted so identical jobs compare equal
+    status TEXT NOT NULL CHECK (status IN ('queued', 'running', 'done', 'failed', 'cancelled')),
+    progress REAL NOT NULL DEFAULT 0,   -- 0..1
+    message TEXT,
+    result TEXT,                -- JSON
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_by TEXT,
+    created_at TEXT NOT NULL,   -- "YYYY-MM-DDTHH:MM:SS+00:00"
+    started_at TEXT,
+    finished_at TEXT
+);
+
+-- At most one identical job in flight
+CREATE UNIQUE INDEX IF NOT EXISTS job_in_flight ON job (name, params) WHERE status IN ('queued', 'running');
+
+-- Availability templates: a player's usual slots, bit i of slot_mask is slot i of the day ("00:00" is bit 0)
+CREATE TABLE IF NOT EXISTS availability_template (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    player_id INT NOT NULL,
+    name TEXT NOT NULL,
+    slot_mask INTEGER NOT NULL,
+    created_at TEXT NOT NULL,   -- "YYYY-MM-DDTHH:MM:SS+00:00"
+    updated_at TEXT NOT NULL,
+    UNIQUE (player_id, name),
+    FOREIGN KEY (player_id) REFERENCES player(player_id)
+);
+
+-- Availability given as template + overrides, instead of rows in availability.
+-- A (player, activity) pair is stored either here or in availability, never both.
+CREATE TABLE IF NOT EXISTS template_use (
+    player_id INT NOT NULL,
+    activity_id INT NOT NULL,
+    template_id INT NOT NULL,
+    added_mask INTEGER NOT NULL DEFAULT 0,      -- slots selected on top of the template
+    removed_mask INTEGER NOT NULL DEFAULT 0,    -- template slots deselected for this activity
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (player_id, activity_id),
+    FOREIGN KEY (player_id) REFERENCES player(player_id),
+    FOREIGN KEY (activity_id) REFERENCES activity(id),
+    FOREIGN KEY (template_id) REFERENCES availability_template(id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS template_use_template ON template_use (template_id);
+
+-- Availability with template uses expanded to one row per slot, read this instead of availability
+CREATE VIEW IF NOT EXISTS effective_availability AS
+WITH RECURSIVE slot_bit (i, slot) AS (
+    SELECT 0, '00:00'
+    UNION ALL
+    SELECT i + 1, printf('%02d:%02d', (i + 1) / 2, (i + 1) % 2 * 30) FROM slot_bit WHERE i < 47
+)
+SELECT player_id, activity_id, slot, created_at FROM availability
+UNION ALL
+SELECT tu.player_id, tu.activity_id, sb.slot, tu.created_at
+FROM template_use tu
+JOIN availability_template t ON t.id = tu.template_id
+JOIN slot_bit sb ON ((t.slot_mask | tu.added_mask) & ~tu.removed_mask) >> sb.i & 1;
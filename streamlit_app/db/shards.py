@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+import sqlite3
+from typing import Any, Callable, TypeVar
+
+from . import connect, get_db_path, list_kingdoms
+
+T = TypeVar("T")
+
+
+def fan_out(
+        query: Callable[[sqlite3.Connection], T],
+        kingdoms: list[str] | None = None,
+) -> dict[str, T]:
+    """
+    Run query against the database of every kingdom in parallel, each on a fresh connection.
+    Returns the results per kingdom. Kingdoms without a database file yet are skipped.
+    """
+    kingdoms = [k for k in (kingdoms or list_kingdoms()) if get_db_path(k).exists()]
+    if not kingdoms:
+        return {}
+
+    def run(kingdom: str) -> T:
+        conn = connect(get_db_path(kingdom))
+        try:
+            return query(conn)
+        finally:
+            conn.close()
+
+    with ThreadPoolExecutor(max_workers=len(kingdoms), thread_name_prefix="db-fan-out") as pool:
+        return dict(zip(kingdoms, pool.map(run, kingdoms)))
+
+
+def _kingdom_stats(conn: sqlite3.Connection) -> dict[str, Any]:
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT
+            (SELECT COUNT(*) FROM player),
+            (SELECT COUNT(*) FROM activity),
+            (SELECT COUNT(*) FROM activity WHERE is_active = 1),
+            (SELECT COUNT(*) FROM availability)
+        """
+    )
+    n_players, n_activities, n_active, n_availability = cur.fetchone()
+    return {
+        "players": n_players,
+        "activities": n_activities,
+        "active_activities": n_active,
+        "availability_rows": n_availability,
+    }
+
+
+def get_kingdom_stats() -> list[dict[str, Any]]:
+    """Return row counts for every kingdom, one merged row per kingdom."""
+    return [
+        {"kingdom": kingdom, **stats}
+        for kingdom, stats in sorted(fan_out(_kingdom_stats).items())
+    ]
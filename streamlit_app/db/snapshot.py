@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+from pathlib import Path
+import sqlite3
+import threading
+import time
+
+from . import connect, current_kingdom, get_db_path, process_resource
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """A consistent point-in-time copy of the database."""
+    conn: sqlite3.Connection
+    taken_at: float         # time.time() when the copy was made
+    data_version: int       # PRAGMA data_version of the source when the copy was made
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.taken_at
+
+
+class SnapshotManager:
+    """
+    Keeps an in-memory copy of the database for exports and reports, so large
+    reads never compete with players' writes on the live connection.
+    The copy is refreshed in a background thread when the database changes.
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._snapshot: Snapshot | None = None
+        self._refresh_thread: threading.Thread | None = None
+        # data_version only changes for commits made by *other* connections,
+        # so this connection is used for nothing but watching the database.
+        self._monitor = connect(db_path)
+        self._monitor_lock = threading.Lock()
+
+    def _data_version(self) -> int:
+        with self._monitor_lock:
+            (version,) = self._monitor.execute("PRAGMA data_version;").fetchone()
+        return version
+
+    def _take(self) -> Snapshot:
+        # Read the version first: a commit during the copy makes the snapshot look stale, never fresh.
+        version = self._data_version()
+        source = connect(self.db_path)
+        target = sqlite3.connect(":memory:", check_same_thread=False)
+        try:
+            # A single step holds one WAL read transaction, which never blocks writers.
+            source.backup(target)
+        finally:
+            source.close()
+        snapshot = Snapshot(conn=target, taken_at=time.time(), data_version=version)
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def refresh(self) -> None:
+        """Start a background refresh, unless one is already running."""
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self._take, name="db-snapshot", daemon=True)
+            self._refresh_thread.start()
+
+    def memory_bytes(self) -> int:
+        """Size of the in-memory copy."""
+        with self._lock:
+            snapshot = self._snapshot
+        if snapshot is None:
+            return 0
+        (page_count,) = snapshot.conn.execute("PRAGMA page_count;").fetchone()
+        (page_size,) = snapshot.conn.execute("PRAGMA page_size;").fetchone()
+        return page_count * page_size
+
+    def get(self) -> Snapshot:
+        """
+        Return the current snapshot. The first call copies the database synchronously,
+        later calls return the existing copy and refresh it in the background if it is stale.
+        """
+        with self._lock:
+            snapshot = self._snapshot
+        if snapshot is None:
+            return self._take()
+        if self._data_version() != snapshot.data_version:
+            self.refresh()
+        return snapshot
+
+
+@process_resource
+def _get_snapshot_manager(kingdom: str) -> SnapshotManager:
+    return SnapshotManager(get_db_path(kingdom))
+
+
+def get_snapshot_manager(kingdom: str | None = None) -> SnapshotManager:
+    """Get the process-wide snapshot manager of a kingdom, by default the current session's kingdom."""
+    return _get_snapshot_manager(kingdom or current_kingdom())
+
+
+def get_snapshot(kingdom: str | None = None) -> Snapshot:
+    """Get the current database snapshot for read-only reporting."""
+    return get_snapshot_manager(kingdom).get()
@@ -0,0 +1,144 @@
+"""
+Availability templates: a player's usual slots, saved once and applied to any activity.
+
+An applied template is stored as a single template_use row holding the template and the slots
+added or removed on top of it, instead of one availability row per slot. Readers go through the
+effective_availability view, which expands template uses on the fly.
+"""
+from datetime import datetime, UTC
+import sqlite3
+
+from . import get_connection
+from .availability import log_changes, mask_to_slots, slots_to_mask
+from .records import TemplateRecord
+
+_SELECT_TEMPLATE = f"SELECT {', '.join(TemplateRecord.__slots__)} FROM availability_template"
+
+
+def _now() -> str:
+    return datetime.now(UTC).isoformat(timespec="seconds")
+
+
+def get_templates(player_id: int) -> list[TemplateRecord]:
+    """Return the player's templates, by name."""
+    cur = get_connection().cursor()
+    cur.row_factory = TemplateRecord.from_row
+    cur.execute(f"{_SELECT_TEMPLATE} WHERE player_id = ? ORDER BY name", (player_id,))
+    return cur.fetchall()
+
+
+def get_applied_template_id(player_id: int, activity_id: int) -> int | None:
+    """Return the template the player applied to this activity, if any."""
+    cur = get_connection().cursor()
+    cur.execute("SELECT template_id FROM template_use WHERE player_id = ? AND activity_id = ?", (player_id, activity_id))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _uses(cur: sqlite3.Cursor, template_id: int) -> dict[tuple[int, int], tuple[int, int]]:
+    """(player_id, activity_id) -> (added_mask, removed_mask) of every use of the template."""
+    cur.execute("SELECT player_id, activity_id, added_mask, removed_mask FROM template_use WHERE template_id = ?", (template_id,))
+    return {(player_id, activity_id): (added, removed) for player_id, activity_id, added, removed in cur.fetchall()}
+
+
+def save_template(player_id: int, name: str, slots: list[str]) -> int:
+    """
+    Create or replace the player's template with this name and return its id.
+    Activities the template is applied to change with it, and the changes are logged.
+    """
+    mask = slots_to_mask(slots)
+    now = _now()
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT id, slot_mask FROM availability_template WHERE player_id = ? AND name = ?",
+            (player_id, name),
+        )
+        existing = cur.fetchone()
+        if existing is None:
+            cur.execute(
+                """
+                INSERT INTO availability_template (player_id, name, slot_mask, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (player_id, name, mask, now, now),
+            )
+            template_id = cur.lastrowid
+        else:
+            template_id, old_mask = existing
+            cur.execute("UPDATE availability_template SET slot_mask = ?, updated_at = ? WHERE id = ?", (mask, now, template_id))
+            for (use_player_id, activity_id), (added, removed) in _uses(cur, template_id).items():
+                before = (old_mask | added) & ~removed
+                after = (mask | added) & ~removed
+                log_changes(cur, use_player_id, activity_id, mask_to_slots(after & ~before), mask_to_slots(before & ~after), now)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return template_id
+
+
+def apply_template(player_id: int, activity_id: int, template_id: int) -> None:
+    """Replace the player's availability for the activity with the template."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT slot_mask FROM availability_template WHERE id = ? AND player_id = ?", (template_id, player_id))
+    row = cur.fetchone()
+    if row is None:
+        raise ValueError(f"Template {template_id} doesn't belong to player {player_id}")
+    (template_mask,) = row
+
+    cur.execute(
+        "SELECT slot FROM effective_availability WHERE player_id = ? AND activity_id = ?",
+        (player_id, activity_id),
+    )
+    current = {slot for (slot,) in cur.fetchall()}
+    new = set(mask_to_slots(template_mask))
+    now = _now()
+
+    try:
+        cur.execute("DELETE FROM availability WHERE player_id = ? AND activity_id = ?", (player_id, activity_id))
+        cur.execute(
+            """
+            INSERT INTO template_use (player_id, activity_id, template_id, added_mask, removed_mask, created_at)
+            VALUES (?, ?, ?, 0, 0, ?)
+            ON CONFLICT (player_id, activity_id) DO UPDATE SET
+                template_id = excluded.template_id, added_mask = 0, removed_mask = 0, created_at = excluded.created_at
+            """,
+            (player_id, activity_id, template_id, now),
+        )
+        log_changes(cur, player_id, activity_id, sorted(new - current), sorted(current - new), now)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def delete_template(player_id: int, template_id: int) -> None:
+    """
+    Delete a template. Activities it was applied to keep their availability,
+    which is written out as plain availability rows.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM availability_template WHERE id = ? AND player_id = ?", (template_id, player_id))
+    if cur.fetchone() is None:
+        raise ValueError(f"Template {template_id} doesn't belong to player {player_id}")
+    try:
+        cur.execute(
+            """
+            INSERT INTO availability (player_id, activity_id, slot, created_at)
+            SELECT ea.player_id, ea.activity_id, ea.slot, ea.created_at
+            FROM effective_availability ea
+            JOIN template_use tu ON tu.player_id = ea.player_id AND tu.activity_id = ea.activity_id
+            WHERE tu.template_id = ?
+            """,
+            (template_id,),
+        )
+        cur.execute("DELETE FROM template_use WHERE template_id = ?", (template_id,))
+        cur.execute("DELETE FROM availability_template WHERE id = ?", (template_id,))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
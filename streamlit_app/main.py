@@ -1,11 +1,11 @@
 import streamlit as st
 
-from streamlit_app.db import init_db
-from streamlit_app.db.activity import get_active_activities
-from streamlit_app.db.availability import save_availability, get_availability_slots
-from streamlit_app.db.player import get_player_by
+from streamlit_app.db.availability import ALL_SLOTS
+from streamlit_app.db.repository import get_repository
 from streamlit_app.utils.authentication import find_player_by_login_name, check_player_pin, \
     register_new_player
+from streamlit_app.utils.kingdom import render_kingdom_selector
+from streamlit_app.utils.session_memory import prune_widget_keys, track_session
 
 
 def render_slot_grid(
@@ -45,7 +45,10 @@ def render_slot_grid(
 
 def run():
     st.set_page_config(page_title="Kingdom 398 events", page_icon="🎯")
-    init_db()
+    kingdom = render_kingdom_selector()
+    repo = get_repository()
+    repo.init()
+    track_session("main")
 
     # Session state for player login
     if "player_id" not in st.session_state:
@@ -59,7 +62,7 @@ def run():
         st.session_state["login_candidate_player_id"] = None
         st.session_state["login_candidate_name"] = None
 
-    st.title("Kingdom 398 events")
+    st.title(f"Kingdom {kingdom} events")
 
     # Log-in flow
     if st.session_state["player_id"] is None:
@@ -97,7 +100,7 @@ def run():
 
             st.subheader("Welcome back!")
 
-            player = get_player_by("player_id", candidate_player_id)
+            player = repo.get_player_by("player_id", candidate_player_id)
             if not player:
                 st.error("Could not load player from database. Please try again.")
                 # reset flow
@@ -210,7 +213,7 @@ def run():
                 st.session_state.pop(key, None)
             st.rerun()
 
-        activities = get_active_activities()
+        activities = repo.get_active_activities()
         if not activities:
             st.error("No active activities.")
             return
@@ -225,9 +228,8 @@ def run():
             activity_labels.append(label)
             activity_ids.append(activity_id)
 
-        # Create half-hour slots
         # Todo: get possible slots from activity table
-        slots = [f"{h:02d}:{m:02d}" for h in range(0, 24) for m in (0, 30)]
+        slots = ALL_SLOTS
 
         with st.form("availability_form"):
             selected_activity_label = st.selectbox("Activity",
@@ -236,7 +238,7 @@ def run():
             selected_activity_id = activity_ids[activity_index]
 
             # Fetch existing slots for this player & activity
-            existing_slots = get_availability_slots(
+            existing_slots = repo.get_availability_slots(
                 player_id=player_id,
                 activity_id=selected_activity_id,
             )
@@ -252,14 +254,62 @@ def run():
 
             submitted_availability = st.form_submit_button("Save availability")
 
+        # Checkbox states of the activities not shown are stale, 48 per activity the player looked at
+        prune_widget_keys(r"^slots_act_(\d+)_", keep=str(selected_activity_id))
+
         if submitted_availability:
-            save_availability(
+            repo.save_availability(
                 player_id=player_id,
                 activity_id=selected_activity_id,
                 slots=selected_slots,
             )
             st.success("Availability saved.")
 
+        render_templates(repo, player_id, selected_activity_id, slots)
+
+
+def render_templates(repo, player_id: int, activity_id: int, slots: list[str]) -> None:
+    """Save the activity's availability as a template, or apply a saved template to the activity."""
+    st.markdown("**Templates**")
+    st.caption("Save your usual slots once and apply them to other activities with one click.")
+
+    templates = repo.get_templates(player_id)
+    applied_id = repo.get_applied_template_id(player_id, activity_id)
+    names = {template.id: template.name for template in templates}
+    if applied_id is not None:
+        st.caption(f"This activity uses template **{names[applied_id]}**, changes you save are kept on top of it.")
+
+    if templates:
+        col1, col2 = st.columns([3, 1])
+        template_id = col1.selectbox(
+            "Template",
+            options=list(names),
+            format_func=names.get,
+            key="template_choice",
+            label_visibility="collapsed",
+        )
+        if col2.button("Apply template"):
+            repo.apply_template(player_id, activity_id, template_id)
+            # Forget the checkbox states so the grid shows the template's slots
+            for slot in slots:
+                st.session_state.pop(f"slots_act_{activity_id}_{slot}", None)
+            st.rerun()
+
+    with st.form("save_template_form"):
+        name = st.text_input("Template name", value="Usual times")
+        submitted_template = st.form_submit_button("Save this activity's availability as a template")
+
+    if submitted_template:
+        saved_slots = repo.get_availability_slots(player_id, activity_id)
+        if not name.strip():
+            st.error("A template name is required.")
+        elif not saved_slots:
+            st.error("Save some availability for this activity first.")
+        else:
+            repo.save_template(player_id, name.strip(), saved_slots)
+            st.toast(f"Template **{name.strip()}** saved.")
+            st.rerun()
+
 
 if __name__ == "__main__":
     run()
@@ -1,34 +1,47 @@
-import hashlib
 import sqlite3
 from typing import Optional
 
-from streamlit_app.db import player as player_db
+from streamlit_app.db.records import PlayerRecord
+from streamlit_app.db.repository import get_repository
+from streamlit_app.utils.pin_hashing import get_pin_hasher
 
 
 def hash_pin(pin: str) -> str:
-    """Simple SHA256 hash to store pin"""
-    return hashlib.sha256(pin.encode("utf-8")).hexdigest()
+    """Salted, versioned KDF hash to store pin, see pin_hashing.py"""
+    return get_pin_hasher().hash(pin)
 
 
-def find_player_by_login_name(name: str) -> Optional[dict]:
+def verify_pin(player: PlayerRecord, pin: str) -> bool:
+    """
+    Check the pin against the player's stored hash.
+    Outdated hashes (legacy SHA-256 or a lower KDF cost) are replaced after a successful check.
+    """
+    hasher = get_pin_hasher()
+    ok, needs_rehash = hasher.verify(pin, player["pin_hash"])
+    if ok and needs_rehash:
+        get_repository().set_player_pin_hash(player["player_id"], hasher.hash(pin))
+    return ok
+
+
+def find_player_by_login_name(name: str) -> Optional[PlayerRecord]:
     """
     Find a player by login name. First look for app_username, then game_username.
     """
     if not name:
         return None
 
-    player = player_db.get_player_by("app_username", name)
+    player = get_repository().get_player_by("app_username", name)
     if player:
         return player
 
-    return player_db.get_player_by("game_username", name)
+    return get_repository().get_player_by("game_username", name)
 
 
 def check_player_pin(player_id: int, pin: str | None) -> tuple[bool, str]:
     """
     For an existing player, allow login if no pin is set, or if correct pin is provided.
     """
-    player = player_db.get_player_by("player_id", player_id)
+    player = get_repository().get_player_by("player_id", player_id)
     if not player:
         return False, "Player not found."
 
@@ -40,7 +53,7 @@ def check_player_pin(player_id: int, pin: str | None) -> tuple[bool, str]:
     if not pin:
         return False, f"{player['game_username']} has a PIN set, enter it to log in."
 
-    if hash_pin(pin) != pin_hash:
+    if not verify_pin(player, pin):
         return False, f"Incorrect PIN."
 
     return True, "Logged in."
@@ -63,7 +76,7 @@ def register_new_player(
     pin_hash = hash_pin(pin) if pin else None
 
     try:
-        player_id = player_db.create_player(
+        player_id = get_repository().create_player(
             user_game_id=user_game_id,
             game_username=game_username,
             app_username=None,
@@ -87,13 +100,13 @@ def authenticate_admin(app_username: str, pin: str) -> tuple[bool, str]:
     if not pin:
         return False, "Please enter your PIN."
 
-    admin = player_db.get_player_by("app_username", app_username)
+    admin = get_repository().get_player_by("app_username", app_username)
 
     if admin is None or not admin["is_admin"]:
         return False, "No admin account found with this username."
     if not admin["pin_hash"]:
         return False, "This admin account has no PIN yet (contact Finch)"
-    if hash_pin(pin) != admin["pin_hash"]:
+    if not verify_pin(admin, pin):
         return False, "Incorrect PIN."
 
     return True, f"Logged in as admin {admin['app_username']} ({admin['game_username']})"
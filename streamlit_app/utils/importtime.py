@@ -0,0 +1,97 @@
+"""
+Measure the import cost of a module with `python -X importtime` and enforce a cold-start budget.
+
+    python -m streamlit_app.utils.importtime app --budget-ms 500 --forbid pandas
+
+Exits with status 1 if the import takes longer than the budget or pulls in a forbidden module.
+The defaults check the player-facing app against its budget, which pandas alone would blow.
+"""
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+import subprocess
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_BUDGET_MS = 500
+DEFAULT_FORBIDDEN = ["pandas"]
+
+
+@dataclass(frozen=True)
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def measure_imports(module: str, python: str = sys.executable) -> list[ImportTiming]:
+    """Import `module` in a fresh interpreter and return the timing of every import it triggered."""
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(proc.stderr)
+
+
+def parse_importtime(output: str) -> list[ImportTiming]:
+    """Parse `-X importtime` lines of the form 'import time: self [us] | cumulative | imported package'."""
+    timings: list[ImportTiming] = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue    # the header line
+        timings.append(
+            ImportTiming(
+                module=fields[2].strip(),
+                self_us=int(fields[0]),
+                cumulative_us=int(fields[1]),
+            )
+        )
+    return timings
+
+
+def total_ms(timings: list[ImportTiming], module: str) -> float:
+    """Cumulative import time of `module` in milliseconds."""
+    for timing in timings:
+        if timing.module == module:
+            return timing.cumulative_us / 1000
+    raise ValueError(f"{module} was not imported")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("module", nargs="?", default="app", help="module to import, default: app")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--forbid", action="append", help="module that must not be imported, default: pandas")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to show")
+    args = parser.parse_args(argv)
+
+    timings = measure_imports(args.module)
+    total = total_ms(timings, args.module)
+
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    for timing in sorted(timings, key=lambda t: t.cumulative_us, reverse=True)[:args.top]:
+        print(f"{timing.cumulative_us / 1000:>14.1f} {timing.self_us / 1000:>8.1f}  {timing.module}")
+
+    ok = True
+    print(f"\nImporting {args.module} took {total:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    if total > args.budget_ms:
+        print("Over budget!")
+        ok = False
+
+    imported = {timing.module for timing in timings}
+    for module in args.forbid or DEFAULT_FORBIDDEN:
+        if module in imported:
+            print(f"{args.module} imports {module}, which should be imported lazily.")
+            ok = False
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
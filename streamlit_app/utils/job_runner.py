@@ -0,0 +1,236 @@
+"""
+Background jobs for heavy admin operations.
+
+Jobs are plain functions registered with @register_job. They run on a bounded thread pool; the
+built-in jobs spend their time in sqlite3 and file I/O, which release the GIL, so other sessions
+keep running. Status, progress and results are stored in the kingdom's job table, so every session
+sees the same state, and identical jobs in flight are deduplicated by the database.
+Export files are kept in data/exports for KINGDOM_EXPORT_KEEP_DAYS days.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, UTC
+import os
+import threading
+import time
+from typing import Any, Callable
+
+from streamlit_app.db import DATA_DIR, connect, current_kingdom, get_db_path, list_kingdoms, process_resource
+from streamlit_app.db import jobs as jobs_db
+from streamlit_app.db.export import EXPORT_TABLES, export_query, write_csv
+from streamlit_app.db.records import JobRecord
+
+JOB_WORKERS = int(os.environ.get("KINGDOM_JOB_WORKERS", 2))
+EXPORT_DIR = DATA_DIR / "exports"
+EXPORT_KEEP_DAYS = float(os.environ.get("KINGDOM_EXPORT_KEEP_DAYS", 7))
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when an admin cancelled it."""
+
+
+class JobContext:
+    """Handed to every job: reports progress and tells the job when it was cancelled."""
+
+    def __init__(self, job_id: int, kingdom: str) -> None:
+        self.job_id = job_id
+        self.kingdom = kingdom
+        self.conn = connect(get_db_path(kingdom))
+        self._last_report = 0.0
+
+    def report(self, progress: float, message: str | None = None, force: bool = False) -> None:
+        """Store progress (0..1). Raises JobCancelled if the job was cancelled."""
+        now = time.monotonic()
+        if not force and now - self._last_report < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_report = now
+        if jobs_db.report_progress(self.conn, self.job_id, progress, message):
+            raise JobCancelled()
+
+
+@dataclass(frozen=True)
+class JobSpec:
+    func: Callable[..., Any]     # func(ctx, **params) -> JSON-serialisable result
+    label: str
+
+
+JOBS: dict[str, JobSpec] = {}
+
+
+def register_job(name: str, label: str):
+    """Register a job function under name."""
+    def decorator(func):
+        JOBS[name] = JobSpec(func, label)
+        return func
+    return decorator
+
+
+def _run_job(name: str, job_id: int, kingdom: str, params: dict[str, Any]) -> None:
+    """Entry point in the worker thread."""
+    ctx = JobContext(job_id, kingdom)
+    try:
+        if not jobs_db.start_job(ctx.conn, job_id):
+            return  # cancelled while queued
+        try:
+            result = JOBS[name].func(ctx, **params)
+        except JobCancelled:
+            jobs_db.finish_job(ctx.conn, job_id, "cancelled")
+        except Exception as e:
+            jobs_db.finish_job(ctx.conn, job_id, "failed", error=f"{type(e).__name__}: {e}")
+        else:
+            jobs_db.finish_job(ctx.conn, job_id, "done", result=result)
+    finally:
+        ctx.conn.close()
+
+
+@process_resource
+def _get_thread_pool() -> ThreadPoolExecutor:
+    # Nothing survives a restart, so whatever was in flight before this process started has failed
+    for kingdom in list_kingdoms():
+        if get_db_path(kingdom).exists():
+            conn = connect(get_db_path(kingdom))
+            try:
+                jobs_db.fail_interrupted_jobs(conn)
+            except Exception:
+                pass    # schema not initialised yet, so no jobs either
+            finally:
+                conn.close()
+    cleanup_exports()
+    return ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+
+
+_futures: dict[tuple[str, int], Future] = {}
+_futures_lock = threading.Lock()
+
+
+def submit_job(name: str, params: dict[str, Any] | None = None, kingdom: str | None = None,
+               created_by: str | None = None) -> tuple[int, bool]:
+    """
+    Queue a job for the kingdom. Returns (job_id, created); when an identical job is already
+    queued or running, its id is returned and nothing new is started.
+    """
+    if name not in JOBS:
+        raise ValueError(f"Unknown job: {name}")
+    params = params or {}
+    kingdom = kingdom or current_kingdom()
+    thread_pool = _get_thread_pool()
+
+    conn = connect(get_db_path(kingdom))
+    try:
+        job_id, created = jobs_db.create_job(conn, name, params, created_by)
+    finally:
+        conn.close()
+
+    if created:
+        try:
+            future = thread_pool.submit(_run_job, name, job_id, kingdom, params)
+        except Exception as e:
+            _finish_abandoned_job(kingdom, job_id, "failed", f"{type(e).__name__}: {e}")
+            raise
+        with _futures_lock:
+            _futures[(kingdom, job_id)] = future
+        future.add_done_callback(lambda f: _on_job_done(kingdom, job_id, f))
+    return job_id, created
+
+
+def _on_job_done(kingdom: str, job_id: int, future: Future) -> None:
+    """
+    Forget the future, and settle the job if _run_job never did: a future that was cancelled,
+    or that raised outside the job function (opening its connection, say).
+    Left queued or running, the job would block identical jobs forever.
+    """
+    with _futures_lock:
+        _futures.pop((kingdom, job_id), None)
+    if future.cancelled():
+        _finish_abandoned_job(kingdom, job_id, "cancelled")
+    elif (e := future.exception()) is not None:
+        _finish_abandoned_job(kingdom, job_id, "failed", f"{type(e).__name__}: {e}")
+
+
+def _finish_abandoned_job(kingdom: str, job_id: int, status: str, error: str | None = None) -> None:
+    conn = connect(get_db_path(kingdom))
+    try:
+        jobs_db.finish_job(conn, job_id, status, error=error)
+    finally:
+        conn.close()
+
+
+def cleanup_exports(keep_days: float = EXPORT_KEEP_DAYS) -> int:
+    """Delete export files (and leftover temporary files) older than keep_days. Returns how many."""
+    if not EXPORT_DIR.is_dir():
+        return 0
+    cutoff = time.time() - keep_days * 86400
+    n_deleted = 0
+    for path in EXPORT_DIR.glob("*.csv*"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                n_deleted += 1
+        except FileNotFoundError:
+            pass    # deleted by another process in the meantime
+    return n_deleted
+
+
+def cancel_job(job_id: int, kingdom: str | None = None) -> None:
+    """Cancel a queued job, or ask a running job to stop."""
+    kingdom = kingdom or current_kingdom()
+    with _futures_lock:
+        future = _futures.get((kingdom, job_id))
+    if future is not None:
+        future.cancel()     # only succeeds if it hasn't started, the job table takes care of the rest
+    conn = connect(get_db_path(kingdom))
+    try:
+        jobs_db.request_cancel(conn, job_id)
+    finally:
+        conn.close()
+
+
+def list_jobs(limit: int = 20, kingdom: str | None = None) -> list[JobRecord]:
+    """Most recent jobs of the kingdom, newest first."""
+    conn = connect(get_db_path(kingdom or current_kingdom()))
+    try:
+        return jobs_db.list_jobs(conn, limit)
+    finally:
+        conn.close()
+
+
+# Built-in jobs
+
+# Threads, not processes: sqlite3 releases the GIL while it reads, and the job is mostly waiting on I/O
+@register_job("export_table", "Export table to CSV")
+def export_table_job(ctx: JobContext, table: str) -> dict[str, Any]:
+    """Write a table to a CSV file in data/exports, streaming rows instead of building a DataFrame."""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    cleanup_exports()
+
+    cur = ctx.conn.cursor()
+    cur.execute(f"SELECT COUNT(*) FROM ({export_query(table)})")
+    (total,) = cur.fetchone()
+
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%SZ")
+    path = EXPORT_DIR / f"{ctx.kingdom}-{table}-{stamp}.csv"
+    tmp_path = path.with_suffix(".csv.tmp")
+
+    try:
+        with tmp_path.open(mode="w", newline="", encoding="utf-8") as f:
+            n_rows = write_csv(
+                table, f, ctx.conn,
+                progress=lambda n: ctx.report(n / max(total, 1), f"{n} of {total} rows"),
+            )
+        tmp_path.replace(path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    return {"path": str(path), "rows": n_rows}
+
+
+@register_job("archive_past_activities", "Archive past activities")
+def archive_past_activities_job(ctx: JobContext) -> dict[str, Any]:
+    from streamlit_app.db.archive import archive_activities
+
+    ctx.report(0.0, "Archiving", force=True)
+    n_activities, n_rows = archive_activities(kingdom=ctx.kingdom)
+    return {"activities": n_activities, "rows": n_rows}
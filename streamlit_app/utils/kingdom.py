@@ -0,0 +1,22 @@
+import streamlit as st
+
+from streamlit_app.db import current_kingdom, list_kingdoms
+
+
+def render_kingdom_selector() -> str:
+    """
+    Show a kingdom picker in the sidebar when more than one kingdom is hosted.
+    Switching kingdoms logs the user out, see current_kingdom(). Returns the current kingdom.
+    """
+    kingdom = current_kingdom()
+    kingdoms = list_kingdoms()
+    if len(kingdoms) < 2:
+        return kingdom
+
+    selected = st.sidebar.selectbox("Kingdom", options=kingdoms, index=kingdoms.index(kingdom))
+    if selected != kingdom:
+        st.session_state["kingdom"] = selected
+        st.query_params["kingdom"] = selected
+        st.rerun()
+
+    return kingdom
@@ -0,0 +1,126 @@
+"""
+PIN hashing with a slow KDF, calibrated to the host and kept off the script thread.
+
+Hashes are stored as "<scheme>$<params>$<salt>$<hash>", for example
+"scrypt$n=16384,r=8,p=1$<salt>$<hash>" (base64 salt and hash). Hashes without a "$" are
+the legacy unsalted SHA-256 hex digests; they still verify and are rehashed on the next login.
+
+The KDF cost is picked at startup so that one hash takes about KINGDOM_PIN_HASH_TARGET_MS on
+this machine, with scrypt n at most KINGDOM_PIN_HASH_MAX_N (each hash in flight needs 1 KiB * n of
+memory, 32 MiB at the default n=32768). Hashing runs on a pool of KINGDOM_PIN_HASH_WORKERS threads: hashlib releases the
+GIL while it hashes, so other sessions keep running, and a login storm queues up on the pool
+instead of saturating every core.
+"""
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import hashlib
+import hmac
+import os
+import secrets
+import time
+
+from streamlit_app.db import process_resource
+
+TARGET_MS = float(os.environ.get("KINGDOM_PIN_HASH_TARGET_MS", 50))
+WORKERS = int(os.environ.get("KINGDOM_PIN_HASH_WORKERS", 2))
+SALT_BYTES = 16
+
+# scrypt cost bounds, n is a power of two and uses 128 * n * r bytes of memory
+SCRYPT_MIN_N, SCRYPT_R, SCRYPT_P = 2 ** 12, 8, 1
+# Rounded down to a power of two, and never below the minimum
+SCRYPT_MAX_N = max(1 << (int(os.environ.get("KINGDOM_PIN_HASH_MAX_N", 2 ** 15)).bit_length() - 1), SCRYPT_MIN_N)
+# PBKDF2 fallback, for OpenSSL builds without scrypt
+PBKDF2_MIN_ITERATIONS, PBKDF2_MAX_ITERATIONS = 50_000, 5_000_000
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+@dataclass(frozen=True)
+class KdfParams:
+    scheme: str     # "scrypt" or "pbkdf2_sha256"
+    cost: int       # scrypt n, or PBKDF2 iterations
+
+    def derive(self, pin: str, salt: bytes) -> bytes:
+        if self.scheme == "scrypt":
+            return hashlib.scrypt(
+                pin.encode("utf-8"), salt=salt, n=self.cost, r=SCRYPT_R, p=SCRYPT_P,
+                maxmem=256 * self.cost * SCRYPT_R, dklen=32,
+            )
+        return hashlib.pbkdf2_hmac("sha256", pin.encode("utf-8"), salt, self.cost)
+
+    def encode(self) -> str:
+        if self.scheme == "scrypt":
+            return f"n={self.cost},r={SCRYPT_R},p={SCRYPT_P}"
+        return f"i={self.cost}"
+
+    @classmethod
+    def decode(cls, scheme: str, params: str) -> "KdfParams":
+        values = dict(item.split("=", 1) for item in params.split(","))
+        if scheme == "scrypt":
+            if (int(values["r"]), int(values["p"])) != (SCRYPT_R, SCRYPT_P):
+                raise ValueError(f"Unsupported scrypt parameters: {params}")
+            return cls(scheme, int(values["n"]))
+        if scheme == "pbkdf2_sha256":
+            return cls(scheme, int(values["i"]))
+        raise ValueError(f"Unknown PIN hash scheme: {scheme}")
+
+
+def calibrate(target_ms: float = TARGET_MS) -> KdfParams:
+    """Return the cheapest KDF parameters taking at least target_ms per hash on this host, within the bounds."""
+    scheme = "scrypt" if hasattr(hashlib, "scrypt") else "pbkdf2_sha256"
+    cost, max_cost = (SCRYPT_MIN_N, SCRYPT_MAX_N) if scheme == "scrypt" else (PBKDF2_MIN_ITERATIONS, PBKDF2_MAX_ITERATIONS)
+    salt = secrets.token_bytes(SALT_BYTES)
+    while cost < max_cost:
+        start = time.perf_counter()
+        KdfParams(scheme, cost).derive("0000", salt)
+        if (time.perf_counter() - start) * 1000 >= target_ms:
+            break
+        cost *= 2
+    return KdfParams(scheme, min(cost, max_cost))
+
+
+class PinHasher:
+    """Hashes and verifies PINs with the calibrated KDF on a bounded worker pool."""
+
+    def __init__(self, params: KdfParams, workers: int = WORKERS) -> None:
+        self.params = params
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pin-hash")
+
+    def _hash(self, pin: str) -> str:
+        salt = secrets.token_bytes(SALT_BYTES)
+        digest = self.params.derive(pin, salt)
+        return f"{self.params.scheme}${self.params.encode()}${_b64(salt)}${_b64(digest)}"
+
+    def _verify(self, pin: str, pin_hash: str) -> tuple[bool, bool]:
+        if "$" not in pin_hash:
+            legacy = hashlib.sha256(pin.encode("utf-8")).hexdigest()
+            return hmac.compare_digest(legacy, pin_hash), True
+
+        try:
+            scheme, params, salt, digest = pin_hash.split("$")
+            stored = KdfParams.decode(scheme, params)
+            ok = hmac.compare_digest(stored.derive(pin, base64.b64decode(salt)), base64.b64decode(digest))
+        except (ValueError, KeyError):
+            return False, False     # malformed or unsupported hash: this PIN can't be verified
+        # Only upgrade, calibration on a slower restart must not weaken hashes
+        return ok, stored.scheme != self.params.scheme or stored.cost < self.params.cost
+
+    def hash(self, pin: str) -> str:
+        """Return the versioned hash of a PIN, with a fresh salt."""
+        return self._pool.submit(self._hash, pin).result()
+
+    def verify(self, pin: str, pin_hash: str) -> tuple[bool, bool]:
+        """
+        Check a PIN against a stored hash. Returns (correct, needs_rehash): needs_rehash is True when
+        the hash is legacy SHA-256, or uses another scheme or a lower cost than the current parameters.
+        """
+        return self._pool.submit(self._verify, pin, pin_hash).result()
+
+
+@process_resource
+def get_pin_hasher() -> PinHasher:
+    """The process-wide PIN hasher, calibrated on first use."""
+    return PinHasher(calibrate())
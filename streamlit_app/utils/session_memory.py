@@ -0,0 +1,104 @@
+"""
+Per-session memory accounting.
+
+Every page run records the size of its session state in a process-wide registry, so super admins
+can see which sessions hold the most memory. Sessions that stop reporting (closed tabs) drop out
+after SESSION_TTL_SECONDS.
+"""
+from dataclasses import dataclass
+import re
+import threading
+import time
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from streamlit_app.db import process_resource
+from streamlit_app.db.memory import deep_sizeof
+
+SESSION_TTL_SECONDS = 60 * 60
+LARGEST_KEYS = 5
+
+
+@dataclass(frozen=True)
+class SessionMemory:
+    session_id: str
+    page: str
+    user: str | None
+    n_keys: int
+    total_bytes: int
+    largest_keys: list[tuple[str, int]]     # (key, bytes), largest first
+    updated_at: float                       # time.time()
+
+
+class SessionMemoryRegistry:
+    """Latest SessionMemory of every live session in this process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._sessions: dict[str, SessionMemory] = {}
+
+    def record(self, report: SessionMemory) -> None:
+        cutoff = time.time() - SESSION_TTL_SECONDS
+        with self._lock:
+            self._sessions[report.session_id] = report
+            for session_id in [s for s, r in self._sessions.items() if r.updated_at < cutoff]:
+                del self._sessions[session_id]
+
+    def largest(self, n: int = 10) -> list[SessionMemory]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return sorted(sessions, key=lambda r: r.total_bytes, reverse=True)[:n]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(r.total_bytes for r in self._sessions.values())
+
+
+@process_resource
+def get_session_registry() -> SessionMemoryRegistry:
+    return SessionMemoryRegistry()
+
+
+def session_state_sizes() -> dict[str, int]:
+    """Bytes held by every session state entry of the current session, largest first."""
+    sizes = {str(key): deep_sizeof(value) for key, value in st.session_state.to_dict().items()}
+    return dict(sorted(sizes.items(), key=lambda item: item[1], reverse=True))
+
+
+def track_session(page: str) -> SessionMemory | None:
+    """Measure the current session's state and record it in the registry. Call once per page run."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return None
+    sizes = session_state_sizes()
+    report = SessionMemory(
+        session_id=ctx.session_id,
+        page=page,
+        user=st.session_state.get("admin_name") or st.session_state.get("player_name"),
+        n_keys=len(sizes),
+        total_bytes=sum(sizes.values()),
+        largest_keys=list(sizes.items())[:LARGEST_KEYS],
+        updated_at=time.time(),
+    )
+    get_session_registry().record(report)
+    return report
+
+
+def prune_widget_keys(pattern: str, keep: str) -> int:
+    """
+    Remove session state keys matching pattern (a regex with one group) whose group isn't keep,
+    e.g. the checkbox states of activities the player isn't looking at. Returns how many were removed.
+    """
+    regex = re.compile(pattern)
+    stale = [
+        key for key in list(st.session_state.keys())
+        if (match := regex.match(str(key))) and match.group(1) != keep
+    ]
+    for key in stale:
+        del st.session_state[key]
+    return len(stale)